@@ -1,11 +1,12 @@
-from api.v1.models import (Cart, Favorite, Ingredient, IngredientRecipe,
-                           Recipe, Tag)
+from api.v1.models import (BuyListItem, Cart, Favorite, Ingredient,
+                           IngredientRecipe, Recipe, Tag)
 from django.contrib import admin
 
 
 class TagModelAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'color', 'slug']
+    list_display = ['id', 'name', 'color', 'slug', 'bit']
     list_filter = ['name', 'slug']
+    readonly_fields = ('bit',)
     ordering = ('id',)
 
 
@@ -22,7 +23,7 @@ class RecipeModelAdmin(admin.ModelAdmin):
 
     @staticmethod
     def get_favorite_count(obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 class IngredientRecipeModelAdmin(admin.ModelAdmin):
@@ -39,6 +40,17 @@ class CartModelAdmin(admin.ModelAdmin):
     list_display = ['recipe', 'user']
     list_filter = ['recipe', 'user']
 
+    def get_readonly_fields(self, request, obj=None):
+        """Cart rows are added and deleted, never moved to other recipe."""
+        if obj is not None:
+            return ('recipe', 'user')
+        return ()
+
+
+class BuyListItemModelAdmin(admin.ModelAdmin):
+    list_display = ['user', 'ingredient', 'total_amount']
+    list_filter = ['user']
+
 
 admin.site.register(Tag, TagModelAdmin)
 admin.site.register(Cart, CartModelAdmin)
@@ -46,3 +58,4 @@ admin.site.register(Recipe, RecipeModelAdmin)
 admin.site.register(Favorite, FavoriteModelAdmin)
 admin.site.register(Ingredient, IngredientModelAdmin)
 admin.site.register(IngredientRecipe, IngredientRecipeModelAdmin)
+admin.site.register(BuyListItem, BuyListItemModelAdmin)
@@ -0,0 +1,22 @@
+from django.core.checks import Error, Tags, register
+from services.cache_services import is_cache_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Version counters, cached documents and tokens are kept in cache,
+    so every process should use the same cache.
+    """
+    if is_cache_shared():
+        return []
+    return [Error(
+        'Default cache is local to the process.',
+        hint=(
+            'Set CACHE_BACKEND to a shared backend, for example '
+            'django.core.cache.backends.memcached.PyMemcacheCache. '
+            'Changes made by one process, including manage.py commands, '
+            'are not seen by the others.'
+        ),
+        id='api.E001',
+    )]
@@ -0,0 +1,44 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from services.pdf_services import register_font, render_buy_list
+
+
+class Command(BaseCommand):
+    """Basecommand using for measuring buy list pdf rendering."""
+    help = 'Measure buy list pdf render time and memory per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10, 100, 1000],
+            help='Numbers of distinct ingredients in the cart.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Renders per cart size.'
+        )
+
+    def handle(self, *args, **options):
+        register_font()
+        for size in options['sizes']:
+            data = [
+                (f'Ингредиент {i}', 'г', i * 10) for i in range(1, size + 1)
+            ]
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                render_buy_list(data, HttpResponse())
+            elapsed = (time.perf_counter() - started) / options['repeat']
+
+            tracemalloc.start()
+            response = HttpResponse()
+            render_buy_list(data, response)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f'{size} ingredients: {elapsed * 1000:.1f} ms, '
+                f'peak {peak / 1024:.0f} KiB, '
+                f'{len(response.content) / 1024:.0f} KiB pdf'
+            )
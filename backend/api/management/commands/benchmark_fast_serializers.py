@@ -0,0 +1,118 @@
+import random
+import time
+
+from api.v1.fast_serializers import get_recipes_data
+from api.v1.models import Ingredient, IngredientRecipe, Recipe, Tag
+from api.v1.serializers import RecipeSerializer
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from services.recipe_document_services import rebuild_recipe_documents
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+INGREDIENTS_PER_RECIPE = 8
+
+
+class Command(BaseCommand):
+    """
+    Basecommand using for measuring recipe list representation
+    built by the serializer and from values() rows
+    on a synthetic dataset. All created rows are rolled back.
+    """
+    help = 'Compare serializer and values() based recipe list pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--page', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_dataset(options['recipes'])
+            request = RequestFactory().get('/api/recipes/')
+            request.user = AnonymousUser()
+            for page in sorted({10, options['page'], options['page'] * 2}):
+                self.compare(request, page, options['repeat'])
+            transaction.set_rollback(True)
+
+    def create_dataset(self, recipes_count):
+        """Create recipes with tags, ingredients and documents."""
+        author = User.objects.create_user(
+            email='benchmark@foodgram.local', username='benchmark',
+            password=None, first_name='benchmark', last_name='benchmark'
+        )
+        Tag.objects.bulk_create(
+            Tag(name=f'benchmark-{i}', slug=f'benchmark-{i}',
+                color=f'#ff{i:04x}')
+            for i in range(4)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'benchmark-{i}', measurement_unit='g')
+            for i in range(100)
+        )
+        Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'benchmark-{i}', text='benchmark',
+                    image='benchmark.png', cooking_time=1)
+             for i in range(recipes_count)),
+            batch_size=BATCH_SIZE
+        )
+        recipe_ids = list(Recipe.objects.filter(
+            author=author
+        ).values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.filter(
+            name__startswith='benchmark-'
+        ).values_list('id', flat=True))
+        tag_ids = list(Tag.objects.filter(
+            slug__startswith='benchmark-'
+        ).values_list('id', flat=True))
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+             for recipe_id in recipe_ids
+             for tag_id in random.sample(tag_ids, 2)),
+            batch_size=BATCH_SIZE
+        )
+        IngredientRecipe.objects.bulk_create(
+            (IngredientRecipe(recipe_id=recipe_id, ingredient_id=pk,
+                              amount=random.randint(1, 500))
+             for recipe_id in recipe_ids
+             for pk in random.sample(ingredient_ids, INGREDIENTS_PER_RECIPE)),
+            batch_size=BATCH_SIZE
+        )
+        rebuild_recipe_documents(recipe_ids)
+
+    def compare(self, request, page, repeat):
+        """Print time and queries of rendering one page by each path."""
+        context = {'request': request}
+        paths = (
+            ('serializer', lambda: RecipeSerializer(
+                Recipe.objects.with_relations()[:page],
+                many=True, context=dict(context)
+            ).data),
+            ('serializer from documents', lambda: RecipeSerializer(
+                Recipe.objects.with_documents()[:page], many=True,
+                context=dict(context, recipe_documents=True)
+            ).data),
+            ('values', lambda: get_recipes_data(
+                Recipe.objects.values(
+                    'id', 'author_id', 'document__data'
+                )[:page],
+                dict(context)
+            )),
+        )
+        renderer = JSONRenderer()
+        for title, build in paths:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    renderer.render(build())
+                elapsed = (time.perf_counter() - started) / repeat
+            self.stdout.write(
+                f'page {page}, {title}: {elapsed * 1000:.1f} ms, '
+                f'{len(queries) // repeat} queries'
+            )
@@ -0,0 +1,88 @@
+import random
+import time
+
+from api.v1.filters import RecipeFilter
+from api.v1.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    """
+    Basecommand using for measuring recipe tag filtering
+    on a synthetic dataset. All created rows are rolled back.
+    """
+    help = 'Compare join and Exists() tag filtering on synthetic recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            slugs = self.create_dataset(options['recipes'], options['tags'])
+            for count in (1, 2, 3):
+                self.compare(slugs[:count], options['repeat'])
+            transaction.set_rollback(True)
+
+    def create_dataset(self, recipes_count, tags_count):
+        """Create tags and recipes with one to three tags each."""
+        author = User.objects.create_user(
+            email='benchmark@foodgram.local', username='benchmark',
+            password=None, first_name='benchmark', last_name='benchmark'
+        )
+        Tag.objects.bulk_create(
+            Tag(name=f'benchmark-{i}', slug=f'benchmark-{i}',
+                color=f'#ff{i:04x}')
+            for i in range(tags_count)
+        )
+        Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'benchmark-{i}', text='benchmark',
+                    image='benchmark.png', cooking_time=1)
+             for i in range(recipes_count)),
+            batch_size=BATCH_SIZE
+        )
+        tags = dict(Tag.objects.filter(
+            slug__startswith='benchmark-'
+        ).values_list('slug', 'id'))
+        recipe_ids = Recipe.objects.filter(
+            author=author
+        ).values_list('id', flat=True)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+             for recipe_id in recipe_ids.iterator()
+             for tag_id in random.sample(
+                 list(tags.values()), random.randint(1, 3))),
+            batch_size=BATCH_SIZE
+        )
+        return sorted(tags)
+
+    def compare(self, slugs, repeat):
+        """Print timings of the join, distinct join and Exists() filtering."""
+        joined = Recipe.objects.filter(tags__slug__in=slugs)
+        data = QueryDict(mutable=True)
+        data.setlist('tags', slugs)
+        filtered = RecipeFilter(data, queryset=Recipe.objects.all()).qs
+
+        for title, queryset in (
+                ('join', joined),
+                ('join distinct', joined.distinct()),
+                ('exists', filtered)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                count = queryset.count()
+                page = list(queryset.values_list('id', flat=True)[:PAGE_SIZE])
+            elapsed = (time.perf_counter() - started) / repeat
+            self.stdout.write(
+                f'{len(slugs)} tags, {title}: {elapsed * 1000:.1f} ms, '
+                f'count {count}, page duplicates '
+                f'{len(page) - len(set(page))}'
+            )
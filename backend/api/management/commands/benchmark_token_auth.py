@@ -0,0 +1,47 @@
+import time
+
+from api.v1.authentication import CachedTokenAuthentication
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Basecommand using for measuring token to user resolution
+    per request. All created rows are rolled back.
+    """
+    help = 'Compare plain and cached token authentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(
+                email='benchmark@foodgram.local', username='benchmark',
+                password=None, first_name='benchmark', last_name='benchmark'
+            )
+            key = Token.objects.create(user=user).key
+            for title, authentication in (
+                    ('plain', TokenAuthentication()),
+                    ('cached', CachedTokenAuthentication())):
+                self.compare(title, authentication, key, options['requests'])
+            transaction.set_rollback(True)
+
+    def compare(self, title, authentication, key, requests):
+        """Print time and queries per resolved token."""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(requests):
+                authentication.authenticate_credentials(key)
+            elapsed = (time.perf_counter() - started) / requests
+        self.stdout.write(
+            f'{title}: {elapsed * 1000000:.1f} us per request, '
+            f'{len(queries) / requests:.3f} queries per request'
+        )
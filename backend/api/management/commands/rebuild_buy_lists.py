@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from services.buy_list_services import get_buy_lists_diff, rebuild_buy_lists
+
+
+class Command(BaseCommand):
+    """Basecommand using for rebuilding buy lists from carts."""
+    help = 'Rebuild or verify buy lists using carts and recipe ingredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report buy list items out of sync with carts.'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            diff = get_buy_lists_diff()
+            for user_id, ingredient_id, stored, expected in diff:
+                self.stdout.write(
+                    f'user {user_id} ingredient {ingredient_id}: '
+                    f'stored {stored}, expected {expected}'
+                )
+            if diff:
+                raise CommandError(f'{len(diff)} buy list items out of sync.')
+            self.stdout.write('Buy lists are consistent.')
+            return
+
+        with transaction.atomic():
+            count = rebuild_buy_lists()
+        self.stdout.write(f'Buy lists rebuilt: {count} items.')
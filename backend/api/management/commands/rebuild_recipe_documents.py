@@ -0,0 +1,33 @@
+from api.v1.models import Recipe
+from django.core.management.base import BaseCommand, CommandError
+from services.recipe_document_services import (get_recipe_documents_diff,
+                                               rebuild_recipe_documents)
+
+
+class Command(BaseCommand):
+    """Basecommand using for rebuilding materialized recipe documents."""
+    help = 'Rebuild or verify pre-serialized recipe documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report missing and outdated recipe documents.'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            diff = get_recipe_documents_diff()
+            for recipe_id, state in diff:
+                self.stdout.write(f'recipe {recipe_id}: {state}')
+            if diff:
+                raise CommandError(
+                    f'{len(diff)} recipe documents out of sync.'
+                )
+            self.stdout.write('Recipe documents are consistent.')
+            return
+
+        count = rebuild_recipe_documents(
+            Recipe.objects.values_list('id', flat=True)
+        )
+        self.stdout.write(f'Recipe documents rebuilt: {count}.')
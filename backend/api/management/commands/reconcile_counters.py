@@ -0,0 +1,63 @@
+from api.v1.models import Cart, Favorite, Recipe
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from services.api_services import count_subquery
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Basecommand using for fixing drift of denormalized counters."""
+    help = 'Recompute favorites, carts and recipes counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report counters out of sync.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = list(Recipe.objects.annotate(
+                actual_favorites=count_subquery(Favorite.objects, 'recipe'),
+                actual_carts=count_subquery(Cart.objects, 'recipe'),
+            ).exclude(
+                favorites_count=F('actual_favorites'),
+                in_carts_count=F('actual_carts'),
+            ).only('id', 'favorites_count', 'in_carts_count'))
+            users = list(User.objects.annotate(
+                actual_recipes=count_subquery(Recipe.objects, 'author'),
+            ).exclude(
+                recipes_count=F('actual_recipes'),
+            ).only('id', 'recipes_count'))
+
+            for recipe in recipes:
+                self.stdout.write(
+                    f'recipe {recipe.id}: favorites '
+                    f'{recipe.favorites_count} -> {recipe.actual_favorites}, '
+                    f'carts {recipe.in_carts_count} -> {recipe.actual_carts}'
+                )
+                recipe.favorites_count = recipe.actual_favorites
+                recipe.in_carts_count = recipe.actual_carts
+            for user in users:
+                self.stdout.write(
+                    f'user {user.id}: recipes '
+                    f'{user.recipes_count} -> {user.actual_recipes}'
+                )
+                user.recipes_count = user.actual_recipes
+
+            if not options['check']:
+                Recipe.objects.bulk_update(
+                    recipes, ['favorites_count', 'in_carts_count'],
+                    batch_size=1000
+                )
+                User.objects.bulk_update(
+                    users, ['recipes_count'], batch_size=1000
+                )
+        self.stdout.write(
+            f'Counters out of sync: {len(recipes)} recipes, '
+            f'{len(users)} users.'
+        )
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_buy_lists(apps, schema_editor):
+    """Sum ingredients of recipes in existing carts."""
+    BuyListItem = apps.get_model('api', 'BuyListItem')
+    IngredientRecipe = apps.get_model('api', 'IngredientRecipe')
+    rows = IngredientRecipe.objects.filter(
+        recipe__cart__isnull=False
+    ).values_list(
+        'recipe__cart__user_id', 'ingredient_id'
+    ).annotate(total_amount=Sum('amount')).order_by()
+    BuyListItem.objects.bulk_create(
+        [
+            BuyListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total_amount
+            )
+            for user_id, ingredient_id, total_amount in rows
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuyListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Total amount')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.ingredient', verbose_name='Ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buy_list', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Buy list item',
+                'verbose_name_plural': 'Buy list items',
+                'db_table': 'buylist',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='buylistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='Unique buy list ingredient'),
+        ),
+        migrations.RunPython(fill_buy_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+FORWARD_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ingredients_name_prefix_idx '
+    'ON ingredients (lower(name) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS ingredients_name_trgm_idx '
+    'ON ingredients USING gin (lower(name) gin_trgm_ops)',
+)
+
+BACKWARD_SQL = (
+    'DROP INDEX IF EXISTS ingredients_name_trgm_idx',
+    'DROP INDEX IF EXISTS ingredients_name_prefix_idx',
+)
+
+
+def run_postgresql(statements):
+    """Run statements on PostgreSQL only, other backends are skipped."""
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_buylistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_postgresql(FORWARD_SQL),
+            run_postgresql(BACKWARD_SQL),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:13
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+TAG_BITS = 63
+
+
+def fill_tags_masks(apps, schema_editor):
+    """Allocate tag bits and compute tags mask for existing recipes."""
+    Tag = apps.get_model('api', 'Tag')
+    Recipe = apps.get_model('api', 'Recipe')
+    tags = list(Tag.objects.order_by('id')[:TAG_BITS])
+    for bit, tag in enumerate(tags):
+        tag.bit = bit
+    Tag.objects.bulk_update(tags, ['bit'])
+
+    masks = defaultdict(int)
+    for recipe_id, bit in Recipe.tags.through.objects.exclude(
+            tag__bit=None).values_list('recipe_id', 'tag__bit'):
+        masks[recipe_id] |= 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(id=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ['tags_mask'],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_ingredient_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Tags mask'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='Bit position'),
+        ),
+        migrations.RunPython(fill_tags_masks, migrations.RunPython.noop),
+    ]
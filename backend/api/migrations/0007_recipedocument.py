@@ -0,0 +1,26 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDocument',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='api.recipe', verbose_name='Recipe')),
+                ('data', models.TextField(verbose_name='Document')),
+            ],
+            options={
+                'verbose_name': 'Recipe document',
+                'verbose_name_plural': 'Recipe documents',
+                'db_table': 'recipe_documents',
+            },
+        ),
+    ]
@@ -0,0 +1,261 @@
+from typing import Iterable
+
+from api.v1.fast_serializers import AUTHOR_FIELDS
+from api.v1.models import (Cart, Favorite, Ingredient, IngredientRecipe,
+                           Recipe, Tag)
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from services.api_services import (change_recipe_counter, change_recipes_count,
+                                   clear_tags_mask_bit, touch_recipes,
+                                   update_recipes_tags_mask)
+from services.buy_list_services import (
+    add_recipe_to_buy_list, apply_recipe_ingredient_change,
+    get_stored_recipe_ingredient, invalidate_buy_lists, lock_cart,
+    lock_recipe_ingredient, remove_cart_from_buy_list,
+    remove_recipe_ingredient_from_buy_lists)
+from services.ingredient_index import invalidate_ingredient_index
+from services.recipe_document_services import schedule_recipe_documents
+from services.response_cache_services import bump_catalog_version
+from services.token_services import invalidate_tokens, invalidate_user_tokens
+from services.viewer_services import invalidate_viewer_ids
+from users.models import Follow
+
+User = get_user_model()
+
+
+def recipes_changed(recipe_ids: Iterable[int]) -> None:
+    """Mark recipes updated and rebuild their documents."""
+    recipe_ids = list(recipe_ids)
+    touch_recipes(recipe_ids)
+    schedule_recipe_documents(recipe_ids)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    """
+    Invalidate ingredient index, catalog and rendered buy lists
+    on ingredient changes.
+    """
+    invalidate_ingredient_index()
+    bump_catalog_version()
+    invalidate_buy_lists()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Mark updated and rebuild recipes using the changed ingredient."""
+    if not created:
+        recipes_changed(Recipe.objects.filter(
+            ingredients=instance
+        ).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    """Invalidate catalog and recipe on ingredients changes."""
+    bump_catalog_version()
+    recipes_changed([instance.recipe_id])
+
+
+@receiver(pre_save, sender=IngredientRecipe)
+def recipe_ingredient_saving(sender, instance, **kwargs):
+    """Remember stored amount of the relation being saved."""
+    instance._stored_amount = get_stored_recipe_ingredient(instance)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    """Apply amount change of the saved relation to buy lists."""
+    apply_recipe_ingredient_change(
+        getattr(instance, '_stored_amount', None), instance
+    )
+
+
+@receiver(pre_delete, sender=IngredientRecipe)
+def recipe_ingredient_deleting(sender, instance, **kwargs):
+    """Lock buy lists counting the relation being deleted."""
+    instance._in_buy_list = lock_recipe_ingredient(instance)
+
+
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    """
+    Subtract the deleted relation from buy lists of carts left,
+    carts deleted with the recipe subtract only relations left.
+    """
+    if getattr(instance, '_in_buy_list', False):
+        remove_recipe_ingredient_from_buy_lists(instance)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep recipe tags mask and recipe documents in sync with recipe tags."""
+    if reverse and action == 'pre_clear':
+        recipes_changed(Recipe.objects.filter(
+            tags=instance
+        ).values_list('id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    bump_catalog_version()
+    if not reverse:
+        update_recipes_tags_mask([instance.pk])
+        recipes_changed([instance.pk])
+    elif action == 'post_clear':
+        clear_tags_mask_bit(instance.bit)
+    else:
+        update_recipes_tags_mask(pk_set)
+        recipes_changed(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    """
+    Invalidate catalog and documents of recipes on tag changes,
+    a bit allocated for an existing tag is added to their tags masks.
+    """
+    bump_catalog_version()
+    if created:
+        return
+    recipe_ids = list(Recipe.objects.filter(
+        tags=instance
+    ).values_list('id', flat=True))
+    if getattr(instance, '_bit_allocated', False):
+        update_recipes_tags_mask(recipe_ids)
+    recipes_changed(recipe_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    """Mark updated and rebuild recipes losing the tag."""
+    recipes_changed(Recipe.objects.filter(
+        tags=instance
+    ).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    """Free the bit of the deleted tag in recipes tags masks."""
+    clear_tags_mask_bit(instance.bit)
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    """
+    Invalidate catalog and rebuild recipe document,
+    new recipe is counted for its author.
+    """
+    bump_catalog_version()
+    schedule_recipe_documents([instance.pk])
+    if created:
+        change_recipes_count(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Invalidate catalog and uncount recipe of the author on delete."""
+    bump_catalog_version()
+    change_recipes_count(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorite_changed(sender, instance, **kwargs):
+    """Invalidate cached favorite recipes of the user."""
+    invalidate_viewer_ids('favorites', [instance.user_id])
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Cart)
+def viewer_recipe_saved(sender, instance, created, **kwargs):
+    """Count new favorite or cart row in the recipe counter."""
+    if created:
+        change_recipe_counter(sender, [instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Cart)
+def viewer_recipe_deleted(sender, instance, **kwargs):
+    """Uncount deleted favorite or cart row in the recipe counter."""
+    change_recipe_counter(sender, [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def cart_changed(sender, instance, **kwargs):
+    """Invalidate cached cart recipes of the user."""
+    invalidate_viewer_ids('cart', [instance.user_id])
+
+
+@receiver(post_save, sender=Cart)
+def cart_saved(sender, instance, created, **kwargs):
+    """Add recipe of the new cart row to the owner buy list."""
+    if created:
+        add_recipe_to_buy_list(
+            instance.user_id, Recipe(id=instance.recipe_id)
+        )
+
+
+@receiver(pre_delete, sender=Cart)
+def cart_deleting(sender, instance, **kwargs):
+    """Lock the owner buy list of the cart row being deleted."""
+    instance._in_buy_list = lock_cart(instance)
+
+
+@receiver(post_delete, sender=Cart)
+def cart_deleted(sender, instance, **kwargs):
+    """
+    Subtract recipe of the deleted cart row from the owner buy list,
+    including rows deleted by cascade and from the admin.
+    """
+    if getattr(instance, '_in_buy_list', False):
+        remove_cart_from_buy_list(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    """Invalidate cached followed authors of the user."""
+    invalidate_viewer_ids('follows', [instance.user_id])
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Forget cached token on logout."""
+    invalidate_tokens([instance.key])
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields, **kwargs):
+    """Remember whether the save changes fields shown in recipes."""
+    fields = set(AUTHOR_FIELDS) - {'id'}
+    if update_fields is not None:
+        fields &= set(update_fields)
+    stored = None
+    if fields and not instance._state.adding:
+        stored = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._author_changed = stored is not None and any(
+        stored[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Forget cached tokens holding the previous state of the user.
+    Catalog and recipe documents show authors,
+    so they are invalidated when the author fields change.
+    """
+    if created:
+        return
+    invalidate_user_tokens(instance.pk)
+    if getattr(instance, '_author_changed', False):
+        bump_catalog_version()
+        recipes_changed(Recipe.objects.filter(
+            author=instance
+        ).values_list('id', flat=True))
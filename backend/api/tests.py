@@ -0,0 +1,785 @@
+import json
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipUnless
+
+from api.v1.fast_serializers import (INGREDIENT_FIELDS, RECIPE_COLUMNS,
+                                     SHORT_RECIPE_FIELDS, TAG_FIELDS,
+                                     get_ingredients_data, get_recipes_data,
+                                     get_short_recipes_data, get_tags_data)
+from api.v1.models import (TAG_BITS, BuyListItem, Cart, Favorite, Ingredient,
+                           IngredientRecipe, Recipe, Tag)
+from api.v1.serializers import (IngredientSerializer, RecipeSerializer,
+                                ShortRecipeSerializer, TagSerializer)
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings, skipUnlessDBFeature)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+from services import recipe_document_services
+from services.buy_list_services import get_buy_lists_diff
+from services.ingredient_search import fuzzy_queryset, prefix_queryset
+from services.recipe_document_services import rebuild_recipe_documents
+from services.token_services import get_token_cache_key, local_tokens
+from users.models import Follow
+
+User = get_user_model()
+
+IMAGE = (
+    'data:image/gif;base64,'
+    'R0lGODlhAQABAIAAAAUEBAAAACwAAAAAAQABAAACAkQBADs='
+)
+
+
+def create_user(name: str) -> User:
+    """Create user with the given username."""
+    return User.objects.create_user(
+        email=f'{name}@foodgram.local', username=name, password='password',
+        first_name=name, last_name=name
+    )
+
+
+def create_recipes(author: User, count: int, ingredients_count: int = 3):
+    """Create recipes of the author with two tags and ingredients each."""
+    tags = [
+        Tag.objects.get_or_create(slug=f'tag-{i}', defaults={
+            'name': f'tag-{i}', 'color': f'#00000{i}'
+        })[0]
+        for i in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.get_or_create(
+            name=f'ingredient-{i}', defaults={'measurement_unit': 'g'}
+        )[0]
+        for i in range(ingredients_count + 2)
+    ]
+    recipes = list()
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=author, name=f'{author.username}-{number}', text='text',
+            image='recipes/image.gif', cooking_time=number + 1
+        )
+        recipe.tags.set([tags[number % 3], tags[(number + 1) % 3]])
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe, amount=10 + i,
+                ingredient=ingredients[(number + i) % len(ingredients)]
+            )
+            for i in range(ingredients_count)
+        )
+        recipes.append(recipe)
+    rebuild_recipe_documents(recipe.id for recipe in recipes)
+    return recipes
+
+
+class QueryCountTestCase(APITestCase):
+    """Base test case starting every test with empty cache."""
+
+    def setUp(self):
+        cache.clear()
+
+    def get_with_queries(self, url: str, queries: int):
+        """Request url with cold cache and check the number of queries."""
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+
+class RecipeListQueriesTest(QueryCountTestCase):
+    """Recipe list is loaded with the same queries for any page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.viewer = create_user('viewer')
+        create_recipes(cls.author, 60)
+
+    def test_anonymous_queries_do_not_depend_on_page_size(self):
+        for limit in (6, 50):
+            response = self.get_with_queries(f'/api/recipes/?limit={limit}', 2)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_authenticated_queries_do_not_depend_on_page_size(self):
+        self.client.force_authenticate(self.viewer)
+        for limit in (6, 50):
+            response = self.get_with_queries(f'/api/recipes/?limit={limit}', 5)
+            self.assertEqual(len(response.data['results']), limit)
+
+
+class RecipeListCountTest(APITestCase):
+    """Cached recipe counts never hide recipes from the list."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        cls.recipes = create_recipes(create_user('author'), 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.viewer)
+
+    def get_list(self, query: str):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_tag_change_updates_count(self):
+        self.assertEqual(self.get_list('tags=tag-2')['count'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].tags.add(Tag.objects.get(slug='tag-2'))
+        data = self.get_list('tags=tag-2')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 3)
+
+    def test_favorites_count_follows_favorites(self):
+        self.assertEqual(self.get_list('is_favorited=1')['count'], 0)
+        self.client.post(f'/api/recipes/{self.recipes[0].id}/favorite/')
+        data = self.get_list('is_favorited=1')
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(len(data['results']), 1)
+
+    def test_stale_count_does_not_cut_pages(self):
+        self.assertEqual(self.get_list('limit=2')['count'], 3)
+        create_recipes(create_user('other'), 2)
+        data = self.get_list('limit=10')
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(len(data['results']), 5)
+        data = self.get_list('limit=2&page=3')
+        self.assertEqual(len(data['results']), 1)
+        self.assertIsNone(data['next'])
+
+    def test_stale_count_does_not_hide_next_page(self):
+        self.assertEqual(self.get_list('limit=3')['count'], 3)
+        create_recipes(create_user('other'), 2)
+        data = self.get_list('limit=3')
+        self.assertEqual(len(data['results']), 3)
+        self.assertIsNotNone(data['next'])
+        self.assertEqual(len(self.get_list('limit=3&page=2')['results']), 2)
+
+
+class TemporaryMediaMixin:
+    """Save uploaded images of the test case to a temporary directory."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+
+class RecipeValidationTest(TemporaryMediaMixin, APITestCase):
+    """Recipe payload validation."""
+
+    def setUp(self):
+        self.author = create_user('author')
+        self.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        self.ingredient = Ingredient.objects.create(
+            name='ingredient', measurement_unit='g'
+        )
+        self.client.force_authenticate(self.author)
+
+    def post_recipe(self, tags, ingredient_id):
+        return self.client.post('/api/recipes/', {
+            'name': 'recipe', 'text': 'text', 'cooking_time': 5,
+            'image': IMAGE, 'tags': tags,
+            'ingredients': [{'id': ingredient_id, 'amount': 10}],
+        }, format='json')
+
+    def test_ids_in_non_canonical_form_are_accepted(self):
+        response = self.post_recipe(
+            [f'0{self.tag.id}'], f'0{self.ingredient.id}'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['tags'][0]['id'], self.tag.id)
+        self.assertEqual(
+            response.data['ingredients'][0]['id'], self.ingredient.id
+        )
+
+    def test_missing_ids_are_rejected(self):
+        response = self.post_recipe([self.tag.id + 1], self.ingredient.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Tag', response.data)
+
+
+class CountersTest(APITestCase):
+    """Counters follow rows changed from any place and never go negative."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.viewer = create_user('viewer')
+        cls.recipe = create_recipes(cls.author, 2)[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.viewer)
+
+    def get_counters(self):
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        return (
+            self.recipe.favorites_count, self.recipe.in_carts_count,
+            self.author.recipes_count
+        )
+
+    def test_orm_changes(self):
+        self.assertEqual(self.get_counters(), (0, 0, 2))
+        Favorite.objects.create(user=self.viewer, recipe=self.recipe)
+        Cart.objects.create(user=self.viewer, recipe=self.recipe)
+        self.assertEqual(self.get_counters(), (1, 1, 2))
+        Favorite.objects.all().delete()
+        Cart.objects.all().delete()
+        Recipe.objects.exclude(id=self.recipe.id).delete()
+        self.assertEqual(self.get_counters(), (0, 0, 1))
+
+    def test_drifted_counters_are_not_decreased_below_zero(self):
+        for model in (Favorite, Cart):
+            model.objects.create(user=self.viewer, recipe=self.recipe)
+        Recipe.objects.update(favorites_count=0, in_carts_count=0)
+        User.objects.update(recipes_count=0)
+        for action in ('favorite', 'shopping_cart'):
+            response = self.client.delete(
+                f'/api/recipes/{self.recipe.id}/{action}/'
+            )
+            self.assertEqual(response.status_code, 204)
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+
+class TagBitTest(APITestCase):
+    """Recipes are filtered by tags getting their bit after creation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = create_recipes(create_user('author'), 1)[0]
+        Tag.objects.bulk_create(
+            Tag(name=f'extra-{bit}', color=f'#0000{bit:02x}',
+                slug=f'extra-{bit}', bit=bit)
+            for bit in range(3, TAG_BITS)
+        )
+
+    def test_late_bit_is_added_to_tags_masks(self):
+        tag = Tag.objects.create(name='late', color='#ff0000', slug='late')
+        self.assertIsNone(tag.bit)
+        self.recipe.tags.add(tag)
+        Tag.objects.get(slug='extra-3').delete()
+        tag.name = 'renamed'
+        tag.save(update_fields=['name'])
+        tag.refresh_from_db()
+        self.assertEqual(tag.bit, 3)
+        response = self.client.get('/api/recipes/?tags=late')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipe.id]
+        )
+
+
+class BuyListSignalsTest(TemporaryMediaMixin, APITestCase):
+    """Buy list follows cart and recipe rows changed from any place."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.viewer = create_user('viewer')
+        cls.recipes = create_recipes(cls.author, 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.viewer)
+
+    def assert_buy_list_in_sync(self):
+        self.assertEqual(get_buy_lists_diff(), [])
+
+    def test_cart_endpoint(self):
+        recipe = self.recipes[0]
+        url = f'/api/recipes/{recipe.id}/shopping_cart/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(BuyListItem.objects.count(), 3)
+        self.assert_buy_list_in_sync()
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(BuyListItem.objects.exists())
+
+    def test_orm_cart_changes(self):
+        for recipe in self.recipes:
+            Cart.objects.create(user=self.viewer, recipe=recipe)
+        self.assert_buy_list_in_sync()
+        Cart.objects.filter(recipe=self.recipes[0]).delete()
+        self.assert_buy_list_in_sync()
+        self.assertTrue(BuyListItem.objects.exists())
+
+    def test_recipe_delete_cascade(self):
+        self.client.post(f'/api/recipes/{self.recipes[1].id}/shopping_cart/')
+        self.client.post('/api/recipes/shopping_cart/', {
+            'recipes': [self.recipes[0].id, self.recipes[2].id]
+        }, format='json')
+        self.assert_buy_list_in_sync()
+        Recipe.objects.get(id=self.recipes[1].id).delete()
+        self.assert_buy_list_in_sync()
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.recipes[0].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_buy_list_in_sync()
+
+    def test_orm_recipe_ingredient_changes(self):
+        for recipe in self.recipes[:2]:
+            Cart.objects.create(user=self.viewer, recipe=recipe)
+        relation = IngredientRecipe.objects.filter(
+            recipe=self.recipes[0]
+        ).first()
+        relation.amount = 99
+        relation.save()
+        self.assert_buy_list_in_sync()
+        relation.recipe = self.recipes[2]
+        relation.save()
+        self.assert_buy_list_in_sync()
+        relation.recipe = self.recipes[1]
+        relation.ingredient = Ingredient.objects.create(
+            name='new', measurement_unit='g'
+        )
+        relation.save()
+        self.assert_buy_list_in_sync()
+        IngredientRecipe.objects.filter(recipe=self.recipes[1]).delete()
+        self.assert_buy_list_in_sync()
+        IngredientRecipe.objects.create(
+            recipe=self.recipes[0], ingredient=relation.ingredient, amount=5
+        )
+        self.assert_buy_list_in_sync()
+
+    def test_recipe_update(self):
+        recipe = self.recipes[0]
+        self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        relations = list(recipe.ingredientrecipe_set.all())
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(f'/api/recipes/{recipe.id}/', {
+            'name': 'renamed', 'text': 'text', 'cooking_time': 5,
+            'image': IMAGE, 'tags': [recipe.tags.first().id],
+            'ingredients': [
+                {'id': relations[0].ingredient_id, 'amount': 7},
+                {'id': Ingredient.objects.create(
+                    name='new', measurement_unit='g'
+                ).id, 'amount': 3},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assert_buy_list_in_sync()
+        self.assertEqual(BuyListItem.objects.count(), 2)
+
+
+class BuyListVersionTest(APITestCase):
+    """Buy list downloads are revalidated after rendered rows change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        cls.recipe = create_recipes(create_user('author'), 1)[0]
+        Cart.objects.create(user=cls.viewer, recipe=cls.recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.viewer)
+
+    def download(self, **headers):
+        return self.client.get(
+            '/api/recipes/download_shopping_cart/?format=txt', **headers
+        )
+
+    def test_ingredient_rename_changes_etag(self):
+        etag = self.download()['ETag']
+        self.assertEqual(
+            self.download(HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        ingredient = self.recipe.ingredients.first()
+        ingredient.name = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('renamed', b''.join(
+            response.streaming_content
+        ).decode())
+
+    def test_format_negotiation(self):
+        url = '/api/recipes/download_shopping_cart/'
+        for accept, media_type in (
+                ('application/json, text/plain, */*', 'application/pdf'),
+                ('*/*', 'application/pdf'),
+                ('text/html', 'application/pdf'),
+                ('text/csv', 'text/csv'),
+                ('application/json', 'application/json'),
+        ):
+            response = self.client.get(url, HTTP_ACCEPT=accept)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith(media_type))
+        response = self.client.get(
+            f'{url}?format=txt', HTTP_ACCEPT='application/pdf'
+        )
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+
+class IngredientIndexTest(APITestCase):
+    """In-memory ingredient index sees ingredients added elsewhere."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_inserted_without_signals_are_found(self):
+        Ingredient.objects.create(name='apple', measurement_unit='g')
+        response = self.client.get('/api/ingredients/?name=ap')
+        self.assertEqual([row['name'] for row in response.data], ['apple'])
+        Ingredient.objects.bulk_create([
+            Ingredient(name='apricot', measurement_unit='g')
+        ])
+        response = self.client.get('/api/ingredients/?name=ap')
+        self.assertEqual(
+            [row['name'] for row in response.data], ['apple', 'apricot']
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL indexes only')
+class IngredientSearchIndexesTest(TestCase):
+    """Ingredient search queries are served by the search indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {number}', measurement_unit='g')
+            for number in range(100)
+        )
+
+    def explain(self, queryset) -> str:
+        """Return query plan, sequential scans win on a small table."""
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_prefix_search_uses_pattern_index(self):
+        self.assertIn(
+            'ingredients_name_prefix_idx',
+            self.explain(prefix_queryset('Ingr')[:10])
+        )
+
+    def test_fuzzy_search_uses_trigram_index(self):
+        self.assertIn(
+            'ingredients_name_trgm_idx',
+            self.explain(fuzzy_queryset('ingrdient', [])[:10])
+        )
+
+
+class FavoriteStatementsTest(APITestCase):
+    """Single favorite is added and removed with minimal statements."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        cls.recipe = create_recipes(create_user('author'), 1)[0]
+
+    def setUp(self):
+        self.client.force_authenticate(self.viewer)
+        self.url = f'/api/recipes/{self.recipe.id}/favorite/'
+
+    def send(self, method: str, statements: int, status_code: int):
+        """Send request and check statements other than transactions."""
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(self.url)
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(len([
+            query for query in context.captured_queries
+            if not query['sql'].startswith(('BEGIN', 'SAVEPOINT', 'RELEASE'))
+        ]), statements)
+
+    def test_add_and_remove(self):
+        self.send('post', 3, 201)
+        self.send('post', 2, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.send('delete', 2, 204)
+        self.send('delete', 1, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CartConcurrencyTest(TransactionTestCase):
+    """Concurrent cart changes are counted once."""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = create_user('viewer')
+        self.ids = [
+            recipe.id for recipe in create_recipes(create_user('author'), 4)
+        ]
+
+    def run_concurrently(self, *requests):
+        """Send (method, url, data) requests from threads at once."""
+        barrier = threading.Barrier(len(requests), timeout=10)
+        statuses = [None] * len(requests)
+
+        def send(number, method, url, data):
+            client = APIClient()
+            client.force_authenticate(self.viewer)
+            try:
+                barrier.wait()
+                response = getattr(client, method)(url, data, format='json')
+                statuses[number] = response.status_code
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=send, args=(number, *request))
+            for number, request in enumerate(requests)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return list(statuses)
+
+    def assert_cart_in_sync(self):
+        self.assertEqual(get_buy_lists_diff(), [])
+        for recipe in Recipe.objects.filter(id__in=self.ids):
+            self.assertEqual(
+                recipe.in_carts_count,
+                Cart.objects.filter(recipe=recipe).count()
+            )
+
+    def test_bulk_and_single_adds(self):
+        bulk = ('post', '/api/recipes/shopping_cart/', {'recipes': self.ids})
+        single = ('post', f'/api/recipes/{self.ids[0]}/shopping_cart/', None)
+        statuses = self.run_concurrently(bulk, bulk, single, single)
+        self.assertEqual(statuses[:2], [201, 201])
+        self.assertTrue(set(statuses[2:]) <= {201, 400}, statuses)
+        self.assertEqual(Cart.objects.count(), len(self.ids))
+        self.assert_cart_in_sync()
+
+    def test_bulk_and_single_removes(self):
+        self.client.force_authenticate(self.viewer)
+        self.client.post(
+            '/api/recipes/shopping_cart/', {'recipes': self.ids},
+            format='json'
+        )
+        bulk = ('delete', '/api/recipes/shopping_cart/', {'recipes': self.ids})
+        single = ('delete', f'/api/recipes/{self.ids[0]}/shopping_cart/', None)
+        statuses = self.run_concurrently(bulk, bulk, single, single)
+        self.assertEqual(statuses[:2], [204, 204])
+        self.assertTrue(set(statuses[2:]) <= {204, 400}, statuses)
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(BuyListItem.objects.exists())
+        self.assert_cart_in_sync()
+
+    def test_adds_of_recipes_sharing_ingredients(self):
+        statuses = self.run_concurrently(*(
+            ('post', f'/api/recipes/{pk}/shopping_cart/', None)
+            for pk in self.ids
+        ))
+        self.assertEqual(statuses, [201] * len(self.ids))
+        self.assert_cart_in_sync()
+
+
+class TokenCacheTest(APITestCase):
+    """Resolved tokens are shared only through a shared cache."""
+
+    def setUp(self):
+        cache.clear()
+        local_tokens.entries.clear()
+        self.user = create_user('viewer')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_local_cache_is_not_used_as_shared(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertIsNone(cache.get(get_token_cache_key(self.token.key)))
+
+    def test_shared_cache_keeps_no_password(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(
+                CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.'
+                               'FileBasedCache',
+                    'LOCATION': location,
+                }}):
+            expected = self.client.get('/api/users/me/').data
+            data = cache.get(get_token_cache_key(self.token.key))
+            self.assertNotIn('password', data['user'])
+            local_tokens.entries.clear()
+            response = self.client.get('/api/users/me/')
+            self.assertEqual(response.data, expected)
+            user = response.wsgi_request.user
+            self.assertIn('password', user.get_deferred_fields())
+            self.assertTrue(user.check_password('password'))
+
+
+class RecipeDocumentRebuildTest(TemporaryMediaMixin, APITransactionTestCase):
+    """
+    Recipe documents are rebuilt once per change and only when needed.
+    Changes are committed, so the rebuilds run as in requests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.author = create_user('author')
+        self.recipe = create_recipes(self.author, 1)[0]
+        self.client.force_authenticate(self.author)
+
+    def rebuilds(self):
+        """Return mock counting document rebuilds."""
+        return mock.patch.object(
+            recipe_document_services, 'rebuild_recipe_documents',
+            wraps=rebuild_recipe_documents
+        )
+
+    def get_document(self):
+        return json.loads(Recipe.objects.with_documents().get(
+            pk=self.recipe.pk
+        ).document.data)
+
+    def test_update_rebuilds_document_once(self):
+        ingredient = Ingredient.objects.exclude(
+            recipes=self.recipe
+        ).first()
+        with self.rebuilds() as rebuild:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/', {
+                    'name': 'renamed', 'text': 'text', 'cooking_time': 5,
+                    'image': IMAGE, 'tags': [self.recipe.tags.first().id],
+                    'ingredients': [{'id': ingredient.id, 'amount': 7}],
+                }, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        rebuild.assert_called_once_with({self.recipe.pk})
+        document = self.get_document()
+        self.assertEqual(document['name'], 'renamed')
+        self.assertEqual(document['ingredients'], response.data['ingredients'])
+        self.assertEqual(len(document['tags']), 1)
+
+    def test_only_author_fields_rebuild_documents(self):
+        updated_at = Recipe.objects.get(pk=self.recipe.pk).updated_at
+        with self.rebuilds() as rebuild:
+            self.author.set_password('new password')
+            self.author.save()
+        rebuild.assert_not_called()
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).updated_at, updated_at
+        )
+        with self.rebuilds() as rebuild:
+            self.author.first_name = 'renamed'
+            self.author.save()
+        rebuild.assert_called_once_with({self.recipe.pk})
+        self.assertEqual(
+            self.get_document()['author']['first_name'], 'renamed'
+        )
+
+
+class FastSerializersContractTest(APITestCase):
+    """values() based representation renders the serializers JSON."""
+    recipe_fieldsets = (
+        None,
+        frozenset(('id', 'name', 'image', 'cooking_time', 'is_favorited',
+                   'is_in_shopping_cart')),
+        frozenset(('id', 'tags', 'author')),
+        frozenset(('id', 'ingredients', 'is_favorited')),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        authors = [create_user(f'author-{number}') for number in range(2)]
+        recipes = [
+            recipe for author in authors
+            for recipe in create_recipes(author, 5, ingredients_count=4)
+        ]
+        for recipe in recipes[::2]:
+            Favorite.objects.create(user=cls.viewer, recipe=recipe)
+        for recipe in recipes[::3]:
+            Cart.objects.create(user=cls.viewer, recipe=recipe)
+        Follow.objects.create(user=cls.viewer, author=authors[0])
+
+    def setUp(self):
+        cache.clear()
+
+    def get_requests(self):
+        """Return anonymous and the viewer requests."""
+        requests = list()
+        for user in (AnonymousUser(), self.viewer):
+            request = RequestFactory().get('/api/recipes/')
+            request.user = user
+            requests.append(request)
+        return requests
+
+    def assert_same_json(self, expected, actual):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+
+    def test_tags(self):
+        self.assert_same_json(
+            TagSerializer(Tag.objects.all(), many=True).data,
+            get_tags_data(Tag.objects.values(*TAG_FIELDS))
+        )
+
+    def test_ingredients(self):
+        self.assert_same_json(
+            IngredientSerializer(Ingredient.objects.all(), many=True).data,
+            get_ingredients_data(
+                Ingredient.objects.values_list(*INGREDIENT_FIELDS)
+            )
+        )
+
+    def test_short_recipes(self):
+        for request in (None, *self.get_requests()):
+            context = {'request': request} if request else {}
+            with self.subTest(request=request):
+                self.assert_same_json(
+                    ShortRecipeSerializer(
+                        Recipe.objects.all(), many=True, context=context
+                    ).data,
+                    get_short_recipes_data(
+                        Recipe.objects.values(*SHORT_RECIPE_FIELDS), request
+                    )
+                )
+
+    def test_recipes(self):
+        for request in self.get_requests():
+            for fields in self.recipe_fieldsets:
+                with self.subTest(user=request.user, fields=fields):
+                    self.assert_recipes(request, fields)
+
+    def assert_recipes(self, request, fields):
+        """Compare recipes built from documents, relations and columns."""
+        expected = RecipeSerializer(
+            Recipe.objects.with_relations(), many=True,
+            context={'request': request, 'fields': fields}
+        ).data
+        rows = list(Recipe.objects.values('id', 'author_id', 'document__data'))
+        self.assert_same_json(expected, get_recipes_data(
+            rows, {'request': request}, fields
+        ))
+        self.assert_same_json(expected, get_recipes_data(
+            [dict(row, document__data=None) for row in rows],
+            {'request': request}, fields
+        ))
+        columns = set(RECIPE_COLUMNS)
+        if fields is not None and not fields - columns - {
+                'id', 'is_favorited', 'is_in_shopping_cart'}:
+            self.assert_same_json(expected, get_recipes_data(
+                Recipe.objects.values(
+                    'id', 'author_id', *(fields & columns)
+                ),
+                {'request': request}, fields
+            ))
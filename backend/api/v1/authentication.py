@@ -0,0 +1,23 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from services.token_services import cache_token, get_cached_token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication resolving token to user through the cache.
+    Unknown tokens and inactive users are checked as usual.
+    """
+
+    def authenticate_credentials(self, key):
+        token = get_cached_token(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache_token(token)
+            return user, token
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return token.user, token
@@ -0,0 +1,182 @@
+import json
+from collections import defaultdict
+from typing import (AbstractSet, Any, Dict, Iterable, List, Mapping, Optional,
+                    Tuple)
+
+from django.contrib.auth import get_user_model
+from services.viewer_services import get_context_viewer_ids
+
+from .models import IngredientRecipe, Recipe, Tag
+
+User = get_user_model()
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+SHORT_RECIPE_FIELDS = ('id', 'name', 'image', 'cooking_time')
+RECIPE_FIELDS = (
+    'id', 'tags', 'author', 'ingredients', 'is_favorited',
+    'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+)
+RECIPE_COLUMNS = ('name', 'image', 'text', 'cooking_time')
+
+
+def get_image_url(name: Optional[str], request: Any = None) -> Optional[str]:
+    """Return image url the way ImageField represents it."""
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def get_tags_data(rows: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Return TagSerializer representation of Tag values() rows."""
+    return [{field: row[field] for field in TAG_FIELDS} for row in rows]
+
+
+def get_ingredients_data(
+        rows: Iterable[Tuple[int, str, str]]
+) -> List[Dict[str, Any]]:
+    """
+    Return IngredientSerializer representation of
+    (id, name, measurement_unit) rows of the ingredient index.
+    """
+    return [dict(zip(INGREDIENT_FIELDS, row)) for row in rows]
+
+
+def get_short_recipes_data(
+        rows: Iterable[Mapping[str, Any]], request: Any = None
+) -> List[Dict[str, Any]]:
+    """Return ShortRecipeSerializer representation of Recipe values() rows."""
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'image': get_image_url(row['image'], request),
+            'cooking_time': row['cooking_time'],
+        }
+        for row in rows
+    ]
+
+
+def get_recipes_relations(
+        recipe_ids: List[int], fields: AbstractSet[str]
+) -> Tuple[Dict[int, List], Dict[int, List]]:
+    """Return {recipe_id: tags} and {recipe_id: ingredients} maps."""
+    tags, ingredients = defaultdict(list), defaultdict(list)
+    if 'tags' in fields:
+        for row in Tag.objects.filter(recipe__in=recipe_ids).values(
+                'recipe', *TAG_FIELDS):
+            tags[row['recipe']].append(
+                {field: row[field] for field in TAG_FIELDS}
+            )
+    if 'ingredients' in fields:
+        for row in IngredientRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+        ).order_by('id').values(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            ingredients[row['recipe_id']].append({
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            })
+    return tags, ingredients
+
+
+def get_recipe_columns_data(row: Mapping[str, Any]) -> Dict[str, Any]:
+    """Return viewer independent representation of recipe columns."""
+    data = {'id': row['id']}
+    for field in RECIPE_COLUMNS:
+        if field in row:
+            data[field] = row[field]
+    if 'image' in data:
+        data['image'] = get_image_url(data['image'])
+    return data
+
+
+def get_recipes_base_data(
+        recipe_ids: List[int], fields: AbstractSet[str]
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Return viewer independent representation of recipes
+    without materialized document, built from values() rows.
+    """
+    rows = list(Recipe.objects.filter(id__in=recipe_ids).values(
+        'id', 'author_id', *RECIPE_COLUMNS
+    ))
+    tags, ingredients = get_recipes_relations(recipe_ids, fields)
+    authors = dict()
+    if 'author' in fields:
+        authors = {
+            author['id']: dict(author, is_subscribed=False)
+            for author in User.objects.filter(
+                id__in={row['author_id'] for row in rows}
+            ).values(*AUTHOR_FIELDS)
+        }
+    base = dict()
+    for row in rows:
+        data = get_recipe_columns_data(row)
+        data.update(
+            tags=tags[row['id']],
+            author=authors.get(row['author_id']),
+            ingredients=ingredients[row['id']]
+        )
+        base[row['id']] = data
+    return base
+
+
+def get_recipes_data(
+        rows: Iterable[Mapping[str, Any]], context: Dict[str, Any],
+        fields: Optional[AbstractSet[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Return RecipeSerializer representation of Recipe values() rows.
+    Rows hold 'id', 'author_id' and either 'document__data'
+    or the requested columns. Recipes without document are built
+    from values() rows of their requested relations.
+    """
+    fields = [
+        field for field in RECIPE_FIELDS if fields is None or field in fields
+    ]
+    rows = list(rows)
+    missing = [
+        row['id'] for row in rows
+        if 'document__data' in row and not row['document__data']
+    ]
+    base = get_recipes_base_data(missing, set(fields)) if missing else {}
+    request = context.get('request')
+    viewer_ids = {
+        field: get_context_viewer_ids(context, kind)
+        for field, kind in (('is_favorited', 'favorites'),
+                            ('is_in_shopping_cart', 'cart'),
+                            ('author', 'follows'))
+        if field in fields
+    }
+
+    result = list()
+    for row in rows:
+        if 'document__data' not in row:
+            data = get_recipe_columns_data(row)
+        elif row['document__data']:
+            data = json.loads(row['document__data'])
+        else:
+            data = base[row['id']]
+        if request is not None and data.get('image') is not None:
+            data['image'] = request.build_absolute_uri(data['image'])
+        if 'author' in viewer_ids:
+            data['author']['is_subscribed'] = (
+                row['author_id'] in viewer_ids['author']
+            )
+        if 'is_favorited' in viewer_ids:
+            data['is_favorited'] = row['id'] in viewer_ids['is_favorited']
+        if 'is_in_shopping_cart' in viewer_ids:
+            data['is_in_shopping_cart'] = (
+                row['id'] in viewer_ids['is_in_shopping_cart']
+            )
+        result.append({field: data[field] for field in fields})
+    return result
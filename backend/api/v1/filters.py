@@ -1,35 +1,57 @@
-from api.v1.models import Recipe
+from api.v1.models import Cart, Favorite, Recipe, Tag
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, F, OuterRef
 from django_filters import rest_framework as filters
-from rest_framework.filters import SearchFilter
 
 User = get_user_model()
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
-        lookup_expr='contains',
-    )
+    tags = filters.CharFilter(method='filter_tags')
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
 
+    def filter_tags(self, queryset, name, value):
+        """
+        Return recipes having any of the given tag slugs.
+        Slugs are resolved to tag bits once and matched with
+        a single bitwise AND on recipe tags mask.
+        Tags without allocated bit are matched with Exists(),
+        so a recipe with several matching tags is returned once.
+        """
+        tags = dict(Tag.objects.filter(
+            slug__in=self.data.getlist(name)
+        ).values_list('id', 'bit'))
+        if not tags:
+            return queryset.none()
+        if None not in tags.values():
+            mask = sum(1 << bit for bit in tags.values())
+            return queryset.alias(
+                tags_match=F('tags_mask').bitand(mask)
+            ).filter(tags_match__gt=0)
+        tag_ids = list(tags)
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'), tag_id__in=tag_ids
+            )
+        ))
+
     def filter_is_favorited(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(Exists(Favorite.objects.filter(
+                user=self.request.user, recipe_id=OuterRef('pk')
+            )))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(cart__user=self.request.user)
+            return queryset.filter(Exists(Cart.objects.filter(
+                user=self.request.user, recipe_id=OuterRef('pk')
+            )))
         return queryset
 
     class Meta:
         model = Recipe
         fields = ['tags', 'author']
-
-
-class IngredientSearchFilter(SearchFilter):
-    search_param = 'name'
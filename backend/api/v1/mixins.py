@@ -0,0 +1,108 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+from config import config_messages as msg
+from django.db.models import QuerySet
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.response import Response
+from services.response_cache_services import get_cached_response
+
+
+class AnonymousCachedListMixin:
+    """
+    Serve list responses of anonymous users from the catalog cache.
+    Responses carry ETag and Last-Modified, so repeat requests get 304.
+    """
+    response_cache_prefix = None
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        build_list = super().list
+        params = [
+            (param, value)
+            for param, values in request.query_params.lists()
+            for value in values
+        ]
+        params.append(('host', request.build_absolute_uri('/')))
+        entry = get_cached_response(
+            self.response_cache_prefix, params,
+            lambda: build_list(request, *args, **kwargs).data
+        )
+        etag = quote_etag(entry['etag'])
+        response = get_conditional_response(
+            request, etag=etag, last_modified=entry['modified']
+        ) or Response(entry['data'])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(entry['modified'])
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+class SparseFieldsMixin:
+    """
+    Limit fields of list and detail responses with 'fields' and 'omit'
+    params taking comma separated field names.
+    """
+
+    @cached_property
+    def requested_fields(self) -> Optional[FrozenSet[str]]:
+        """Return requested fields, None means all of them."""
+        params = self.request.query_params
+        if self.action not in ('list', 'retrieve') or not (
+                'fields' in params or 'omit' in params):
+            return None
+        available = frozenset(self.get_serializer_class().Meta.fields)
+        fields = self.split_fields(params.get('fields')) or available
+        omit = self.split_fields(params.get('omit'))
+        unknown = (fields | omit) - available
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': f'{msg.UNKNOWN_FIELDS}: {", ".join(sorted(unknown))}'
+            })
+        return fields - omit
+
+    @staticmethod
+    def split_fields(value: Optional[str]) -> FrozenSet[str]:
+        """Return set of comma separated field names."""
+        return frozenset(
+            field.strip() for field in (value or '').split(',')
+            if field.strip()
+        )
+
+    def get_serializer_context(self) -> Dict[str, Any]:
+        """Pass requested fields to the serializer."""
+        context = super().get_serializer_context()
+        context['fields'] = self.requested_fields
+        return context
+
+
+class ValuesListMixin:
+    """
+    Build list responses from .values() rows with plain dicts
+    instead of model instances and the serializer.
+    Rows hold 'list_fields' and are built by 'list_builder',
+    views with other rows override the methods.
+    """
+    list_fields = ()
+    list_builder = None
+
+    def get_list_rows(self, queryset: QuerySet) -> QuerySet:
+        """Return values() queryset of the list fields."""
+        return queryset.values(*self.list_fields)
+
+    def get_list_data(self, rows: Iterable[Dict[str, Any]]) -> List[Any]:
+        """Return representation of the rows built by the list builder."""
+        return self.list_builder(rows)
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        rows = self.get_list_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_list_data(page))
+        return Response(self.get_list_data(rows))
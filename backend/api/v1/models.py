@@ -1,11 +1,17 @@
+from typing import Tuple, Union
+
 from colorfield.fields import ColorField
 from config import config_messages as msg
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Prefetch
+from services.model_services import CounterFieldsMixin
 
 User = get_user_model()
 
+TAG_BITS = 63
+
 
 class Tag(models.Model):
     """Stores a single tag entry."""
@@ -27,9 +33,43 @@ class Tag(models.Model):
         verbose_name='Slug'
     )
 
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Bit position'
+    )
+
     def __str__(self):
         return f'{self.name}'
 
+    def save(self, *args, **kwargs):
+        """
+        Allocate bit position in recipe tags mask for a tag without it.
+        A bit allocated for an existing tag is flagged, so signals
+        add it to tags masks of the tag recipes.
+        """
+        self._bit_allocated = False
+        if self.bit is None:
+            self.bit = self.allocate_bit()
+            self._bit_allocated = (
+                self.bit is not None and not self._state.adding
+            )
+            update_fields = kwargs.get('update_fields')
+            if self._bit_allocated and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'bit'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def allocate_bit(cls):
+        """
+        Return the lowest free bit position
+        or None if all TAG_BITS positions are taken.
+        """
+        used = set(cls.objects.exclude(bit=None).values_list('bit', flat=True))
+        return next((bit for bit in range(TAG_BITS) if bit not in used), None)
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'Tag'
@@ -63,7 +103,34 @@ class Ingredient(models.Model):
         db_table = 'ingredients'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Recipe queryset with helpers for the list and detail endpoints."""
+
+    @staticmethod
+    def relation_lookups() -> Tuple[Union[str, Prefetch], ...]:
+        """Return prefetch lookups of recipe tags and ingredient rows."""
+        return (
+            'tags',
+            Prefetch(
+                'ingredientrecipe_set',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            )
+        )
+
+    def with_relations(self) -> 'RecipeQuerySet':
+        """Load author, tags and ingredient rows in a constant query count."""
+        return self.select_related('author').prefetch_related(
+            *self.relation_lookups()
+        )
+
+    def with_documents(self) -> 'RecipeQuerySet':
+        """Load materialized recipe documents."""
+        return self.select_related('document')
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """
     Stores a single recipe entry, related to:
     :model:`author.User`,
@@ -112,6 +179,39 @@ class Recipe(models.Model):
         )]
     )
 
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Tags mask'
+    )
+
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Favorites count'
+    )
+
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='In carts count'
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Created'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Updated at'
+    )
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('tags_mask', 'favorites_count', 'in_carts_count')
+
     def __str__(self):
         return f'{self.name}'
 
@@ -218,3 +318,70 @@ class Cart(models.Model):
                 name='User carts'
             )
         ]
+
+
+class BuyListItem(models.Model):
+    """
+    Stores the total amount of a single ingredient in the user cart,
+    related to :model:`ingredients.Ingredient` and :model:`user.User`.
+    Maintained on every cart and cart recipe ingredients change.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='buy_list',
+        verbose_name='User',
+    )
+
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ingredient',
+    )
+
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Total amount',
+    )
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.total_amount}'
+
+    class Meta:
+        verbose_name = 'Buy list item'
+        verbose_name_plural = 'Buy list items'
+        db_table = 'buylist'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='Unique buy list ingredient'
+            )
+        ]
+
+
+class RecipeDocument(models.Model):
+    """
+    Stores pre-serialized viewer independent representation
+    of :model:`recipes.Recipe`, rebuilt on every recipe,
+    recipe tags, ingredients or author change.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+        verbose_name='Recipe',
+    )
+
+    data = models.TextField(
+        verbose_name='Document',
+    )
+
+    def __str__(self):
+        return f'{self.recipe_id}'
+
+    class Meta:
+        verbose_name = 'Recipe document'
+        verbose_name_plural = 'Recipe documents'
+        db_table = 'recipe_documents'
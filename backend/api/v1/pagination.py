@@ -1,6 +1,179 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from services.cache_services import get_version_counter
+from services.response_cache_services import CATALOG_VERSION_KEY
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator caching total count under the given key.
+    With 'estimate' set, the PostgreSQL planner estimate is used
+    for tables larger than PAGINATION_COUNT_ESTIMATE_THRESHOLD.
+
+    Cached or estimated count only limits page numbers, pages are cut
+    by the rows actually fetched: one extra row is selected to know
+    whether the next page exists, and the count is corrected
+    whenever the fetched rows prove it wrong.
+    """
+
+    def __init__(self, *args, cache_key=None, estimate=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_key = cache_key
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        if self.cache_key is None:
+            return super().count
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = self.get_estimated_count() if self.estimate else None
+            if count is None:
+                count = super().count
+            cache.set(
+                self.cache_key, count,
+                timeout=settings.PAGINATION_COUNT_CACHE_TIMEOUT
+            )
+        return count
+
+    def get_estimated_count(self):
+        """
+        Return planner estimate of the table rows count
+        or None if it is unavailable or below the threshold.
+        """
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+        if row is None or row[0] < threshold:
+            return None
+        return row[0]
+
+    def set_count(self, count):
+        """Replace the cached count and the values computed from it."""
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        cache.set(
+            self.cache_key, count,
+            timeout=settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        )
+
+    def page(self, number):
+        if self.cache_key is None:
+            return super().page(number)
+        try:
+            number = self.validate_number(number)
+        except EmptyPage:
+            self.set_count(super().count)
+            number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        rows = list(self.object_list[bottom:top + 1])
+        if not rows and number > 1:
+            self.set_count(super().count)
+            self.validate_number(number)
+        elif len(rows) > self.per_page:
+            if self.count <= top:
+                self.set_count(top + 1)
+        elif self.count != bottom + len(rows):
+            self.set_count(bottom + len(rows))
+        return self._get_page(rows[:self.per_page], number, self)
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination by '-id' with opaque cursors and no count query."""
+    ordering = '-id'
+    page_size = 6
+    page_size_query_param = 'limit'
 
 
 class LimitPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination with 'limit' param.
+    Switches to keyset pagination if 'pagination=cursor'
+    or 'cursor' param is passed.
+
+    Views with 'count_cache_prefix' get total count cached per
+    normalized filter params under the catalog version, params listed
+    in 'count_cache_user_params' depend on the user, so their counts
+    are not cached. The count of unfiltered list may be estimated
+    on PostgreSQL.
+    """
     page_size = 6
     page_size_query_param = 'limit'
+    mode_query_param = 'pagination'
+    cursor_pagination_class = IdCursorPagination
+    cursor_paginator = None
+    count_cache_key = None
+    count_estimate = False
+
+    def django_paginator_class(self, object_list, per_page):
+        return CachedCountPaginator(
+            object_list, per_page,
+            cache_key=self.count_cache_key,
+            estimate=self.count_estimate
+        )
+
+    def get_filter_params(self, request):
+        """Return sorted query params not related to pagination."""
+        skipped = {
+            self.page_query_param, self.page_size_query_param,
+            self.mode_query_param, 'format'
+        }
+        return sorted(
+            (key, sorted(request.query_params.getlist(key)))
+            for key in request.query_params if key not in skipped
+        )
+
+    def get_count_cache_key(self, request, view):
+        """
+        Return count cache key or None if the view does not opt in
+        or the params depend on the user.
+        """
+        prefix = getattr(view, 'count_cache_prefix', None)
+        if prefix is None:
+            return None
+        params = self.get_filter_params(request)
+        user_params = getattr(view, 'count_cache_user_params', ())
+        if any(key in user_params for key, _ in params):
+            return None
+        digest = hashlib.md5(repr(params).encode()).hexdigest()
+        version = get_version_counter(CATALOG_VERSION_KEY)
+        return f'{prefix}_count:{version}:{digest}'
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.count_cache_key = self.get_count_cache_key(request, view)
+        self.count_estimate = (
+            self.count_cache_key is not None
+            and not self.get_filter_params(request)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
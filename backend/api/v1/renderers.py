@@ -0,0 +1,61 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class DownloadRenderer(BaseRenderer):
+    """
+    Base renderer for file downloads.
+    File content is returned by the view itself,
+    error responses are rendered as JSON.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.exception:
+            response['Content-Type'] = JSONRenderer.media_type
+            return JSONRenderer().render(data)
+        return data
+
+
+class PDFRenderer(DownloadRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+
+class CSVRenderer(DownloadRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PlainTextRenderer(DownloadRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class DownloadContentNegotiation(DefaultContentNegotiation):
+    """
+    Select the renderer of the 'format' param, otherwise the renderer
+    of the only download type named in Accept header or the first
+    (default) one, so generic headers like
+    'application/json, text/plain, */*' keep getting the default file.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        file_format = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE
+        )
+        if file_format:
+            renderer = self.filter_renderers(renderers, file_format)[0]
+            return renderer, renderer.media_type
+        accepted = {
+            media_type.split(';')[0].strip()
+            for media_type in self.get_accept_list(request)
+        }
+        named = [
+            renderer for renderer in renderers
+            if renderer.media_type in accepted
+        ]
+        renderer = named[0] if len(named) == 1 else renderers[0]
+        return renderer, renderer.media_type
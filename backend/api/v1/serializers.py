@@ -1,6 +1,9 @@
-from typing import Dict, List, Union
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Union
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
@@ -8,10 +11,14 @@ from services.api_services import (check_data_is_not_none,
                                    check_data_to_list_isinstance,
                                    check_ingredients_is_unique,
                                    create_ingredient_amount_relations,
-                                   get_exists_models_relations,
-                                   validate_value)
+                                   get_recipes_limit,
+                                   update_ingredient_amount_relations,
+                                   update_recipe_tags, validate_value,
+                                   validate_values)
+from services.viewer_services import get_context_viewer_ids
 from users.models import Follow
 
+from .fast_serializers import SHORT_RECIPE_FIELDS, get_short_recipes_data
 from .models import Ingredient, IngredientRecipe, Recipe, Tag
 
 User = get_user_model()
@@ -19,6 +26,8 @@ User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for UserModel."""
+    is_subscribed = serializers.SerializerMethodField()
+
     class Meta:
         model = User
         fields = (
@@ -26,6 +35,10 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name', 'is_subscribed'
         )
 
+    def get_is_subscribed(self, obj: User) -> bool:
+        """Return whether the request user is subscribed to the user."""
+        return obj.id in get_context_viewer_ids(self.context, 'follows')
+
 
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for TagModel."""
@@ -80,6 +93,14 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
         )
 
+    def __init__(self, *args, **kwargs):
+        """Drop fields missing in 'fields' context value when it is set."""
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for field in set(self.fields) - fields:
+                self.fields.pop(field)
+
     def validate(self, data):
         """Validate data before create new relations."""
         ingredients, tags = (
@@ -91,21 +112,18 @@ class RecipeSerializer(serializers.ModelSerializer):
         check_data_is_not_none(ingredients, tags)
         check_ingredients_is_unique(ingredients)
 
-        for tag in tags:
-            validate_value(tag, Tag, 'Tag')
-
-        validated_ing = list()
+        validate_values(tags, Tag, 'Tag')
 
         for ing in ingredients:
-            ing_id, amount = ing.get('id'), ing.get('amount')
-            ingredient = validate_value(ing_id, Ingredient, 'Ingredient')
-
-            validate_value(amount)
-            validated_ing.append({'ingredient': ingredient, 'amount': amount})
+            validate_value(ing.get('amount'))
+        validate_values(
+            [ing.get('id') for ing in ingredients], Ingredient, 'Ingredient'
+        )
 
         data['ingredients'], data['tags'] = ingredients, tags
         return data
 
+    @transaction.atomic
     def create(self, validated_data: Dict[str, Union[List, str]]) -> Recipe:
         """Create new recipe."""
         tags, ingredients = (
@@ -119,47 +137,69 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @transaction.atomic
     def update(
             self,
             instance: Recipe,
             validated_data: Dict[str, Union[str, List[Dict[str, str]]]]
     ) -> Recipe:
-        """Update recipe."""
-        instance.name = validated_data.get('name', instance.image)
-        instance.image = validated_data.get('image', instance.image)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time',
-            instance.cooking_time
-        )
-
-        instance.tags.clear()
-        tags = self.initial_data.get('tags')
-        instance.tags.set(tags)
-
-        IngredientRecipe.objects.filter(recipe=instance).all().delete()
-
-        create_ingredient_amount_relations(
+        """
+        Update recipe.
+        Only changed columns, tags and ingredient amounts are written.
+        """
+        update_fields = list()
+        for field in ('name', 'image', 'text', 'cooking_time'):
+            if field not in validated_data:
+                continue
+            value = validated_data[field]
+            if field == 'image' or getattr(instance, field) != value:
+                setattr(instance, field, value)
+                update_fields.append(field)
+        if update_fields:
+            instance.save(update_fields=update_fields + ['updated_at'])
+
+        update_recipe_tags(validated_data.get('tags'), instance)
+        update_ingredient_amount_relations(
             validated_data.get('ingredients'),
             instance
         )
-        instance.save()
 
         return instance
 
+    def to_representation(self, instance: Recipe) -> Dict[str, Any]:
+        """
+        Merge viewer dependent flags into the materialized recipe document
+        when 'recipe_documents' is set in context and the document
+        was loaded with the recipe. Other recipes are serialized as usual.
+        """
+        if not (self.context.get('recipe_documents')
+                and hasattr(instance, 'document')):
+            return super().to_representation(instance)
+        data = json.loads(
+            instance.document.data, object_pairs_hook=OrderedDict
+        )
+        request = self.context.get('request')
+        if 'image' in self.fields and request is not None:
+            data['image'] = request.build_absolute_uri(data['image'])
+        if 'author' in self.fields:
+            data['author']['is_subscribed'] = data['author']['id'] in (
+                get_context_viewer_ids(self.context, 'follows')
+            )
+        if 'is_favorited' in self.fields:
+            data['is_favorited'] = self.get_is_favorited(instance)
+        if 'is_in_shopping_cart' in self.fields:
+            data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(
+                instance
+            )
+        return OrderedDict((field, data[field]) for field in self.fields)
+
     def get_is_favorited(self, obj: Recipe) -> bool:
         """Return favorite recipes for user."""
-        user = self.context.get('request').user
-        params = {'favorites__user': user, 'id': obj.id}
-
-        return get_exists_models_relations(user, Recipe, params)
+        return obj.id in get_context_viewer_ids(self.context, 'favorites')
 
     def get_is_in_shopping_cart(self, obj: Recipe) -> bool:
         """Return recipes added to cart."""
-        user = self.context.get('request').user
-        params = {'cart__user': user, 'id': obj.id}
-
-        return get_exists_models_relations(user, Recipe, params)
+        return obj.id in get_context_viewer_ids(self.context, 'cart')
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
@@ -190,25 +230,33 @@ class FollowSerializer(serializers.ModelSerializer):
             'is_subscribed', 'recipes', 'recipes_count'
         )
 
-    @staticmethod
-    def get_is_subscribed(obj):
-        """Return boolean value of subscribed status."""
-        return Follow.objects.filter(user=obj.user, author=obj.author).exists()
+    def get_is_subscribed(self, obj: Follow) -> bool:
+        """Return whether the user is subscribed to the author."""
+        return obj.author_id in get_context_viewer_ids(self.context, 'follows')
 
     @staticmethod
-    def get_recipes_count(obj):
+    def get_recipes_count(obj: Follow) -> int:
         """Return integer value for the number of recipes."""
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.recipes_count
 
-    def get_recipes(self, obj):
+    def get_recipes(self, obj: Follow) -> List[Dict[str, Any]]:
         """
         Return recipes set.
         If @param 'recipes_limit' in request
         returns a set given a slice by constraint.
+        Recipes preloaded by the view are taken from 'authors_recipes'.
         """
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if recipes_limit:
-            queryset = queryset[:int(recipes_limit)]
-        return ShortRecipeSerializer(queryset, many=True).data
+        authors_recipes = self.context.get('authors_recipes')
+        if authors_recipes is not None:
+            rows = authors_recipes.get(obj.author_id, [])
+        else:
+            request = self.context.get('request')
+            recipes_limit = get_recipes_limit(
+                request.GET.get('recipes_limit')
+            )
+            rows = Recipe.objects.filter(
+                author=obj.author
+            ).values(*SHORT_RECIPE_FIELDS)
+            if recipes_limit is not None:
+                rows = rows[:recipes_limit]
+        return get_short_recipes_data(rows)
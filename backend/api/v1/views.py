@@ -1,30 +1,54 @@
-from typing import Union
+from typing import Any, Dict, Iterable, List, Union
 
-from api.v1.filters import IngredientSearchFilter, RecipeFilter
-from api.v1.models import (Cart, Favorite, Ingredient, IngredientRecipe,
-                           Recipe, Tag)
+from api.v1.fast_serializers import (TAG_FIELDS, get_ingredients_data,
+                                     get_recipes_data, get_tags_data)
+from api.v1.filters import RecipeFilter
+from api.v1.mixins import (AnonymousCachedListMixin, SparseFieldsMixin,
+                           ValuesListMixin)
+from api.v1.models import Cart, Favorite, Ingredient, Recipe, Tag
 from api.v1.pagination import LimitPageNumberPagination
 from api.v1.permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly
+from api.v1.renderers import (CSVRenderer, DownloadContentNegotiation,
+                              PDFRenderer, PlainTextRenderer)
 from api.v1.serializers import (IngredientSerializer, RecipeSerializer,
                                 ShortRecipeSerializer, TagSerializer)
-from django.http import FileResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import (HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
+from django.http.response import HttpResponseBase
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, parse_etags, quote_etag
 from django_filters import rest_framework as drf_filter
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
-from services.api_services import (create_buy_list, create_obj,
-                                   create_pdf_file, delete_obj)
+from services.api_services import (bulk_create_objs, bulk_delete_objs,
+                                   create_obj, delete_obj)
+from services.buy_list_services import (get_buy_list, get_buy_list_pdf,
+                                        get_buy_list_version)
+from services.export_services import BUY_LIST_STREAMS
+from services.ingredient_search import prefix_matches, search_ingredients
+from services.recipe_document_services import schedule_recipe_documents
+from services.viewer_services import get_context_viewer_ids
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class TagsViewSet(AnonymousCachedListMixin, ValuesListMixin,
+                  ReadOnlyModelViewSet):
     """Tag view set."""
     http_method_names = ['get']
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    response_cache_prefix = 'tags'
+    list_fields = TAG_FIELDS
+    list_builder = staticmethod(get_tags_data)
 
 
 class IngredientsViewSet(ReadOnlyModelViewSet):
@@ -33,11 +57,23 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
 
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """
+        Return ingredients whose name starts with 'name' param,
+        followed by similar names on PostgreSQL.
+        Search results are limited by INGREDIENT_SEARCH_LIMIT.
+        """
+        name = request.query_params.get('name', '')
+        if name:
+            rows = search_ingredients(name, settings.INGREDIENT_SEARCH_LIMIT)
+        else:
+            rows = prefix_matches('')
+        return Response(get_ingredients_data(rows))
 
-class RecipesViewSet(viewsets.ModelViewSet):
+
+class RecipesViewSet(AnonymousCachedListMixin, SparseFieldsMixin,
+                     ValuesListMixin, viewsets.ModelViewSet):
     """Recipes view set."""
     http_method_names = ['get', 'post', 'patch', 'delete']
     queryset = Recipe.objects.all()
@@ -46,12 +82,117 @@ class RecipesViewSet(viewsets.ModelViewSet):
     pagination_class = LimitPageNumberPagination
     filter_backends = (drf_filter.DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    count_cache_prefix = 'recipes'
+    response_cache_prefix = 'recipes'
+    count_cache_user_params = ('is_favorited', 'is_in_shopping_cart')
+
+    relation_fields = frozenset(('tags', 'author', 'ingredients'))
+    column_fields = frozenset(('name', 'image', 'text', 'cooking_time'))
+
+    @property
+    def uses_documents(self) -> bool:
+        """Documents are loaded unless only plain fields are requested."""
+        return self.requested_fields is None or bool(
+            self.requested_fields & self.relation_fields
+        )
+
+    def get_queryset(self):
+        """
+        Return recipes with materialized documents loaded upfront,
+        or only the requested columns when no relation is requested.
+        """
+        if self.uses_documents:
+            return Recipe.objects.with_documents()
+        return Recipe.objects.only(
+            'author', 'updated_at',
+            *(self.requested_fields & self.column_fields)
+        )
+
+    def get_serializer_context(self) -> Dict[str, Any]:
+        """Serialize recipes from their materialized documents."""
+        context = super().get_serializer_context()
+        context['recipe_documents'] = self.uses_documents
+        return context
+
+    def get_list_rows(self, queryset: QuerySet) -> QuerySet:
+        """Return documents or the requested columns of recipes."""
+        if self.uses_documents:
+            return queryset.values('id', 'author_id', 'document__data')
+        return queryset.values(
+            'id', 'author_id', *(self.requested_fields & self.column_fields)
+        )
+
+    def get_list_data(self, rows: Iterable[Dict[str, Any]]) -> List[Any]:
+        """Build recipes representation without the serializer."""
+        return get_recipes_data(
+            rows, self.get_serializer_context(), self.requested_fields
+        )
+
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        """
+        Return recipe with ETag and Last-Modified taken from its
+        updated timestamp, answering conditional requests with 304
+        before serialization. ETag of authenticated users covers
+        their favorite, cart and subscription flags, Last-Modified
+        is sent to anonymous users only.
+        """
+        instance = self.get_object()
+        context = self.get_serializer_context()
+        flags = ''.join(
+            str(int(pk in get_context_viewer_ids(context, kind)))
+            for kind, pk in (
+                ('favorites', instance.id),
+                ('cart', instance.id),
+                ('follows', instance.author_id),
+            )
+        )
+        updated = instance.updated_at.timestamp()
+        etag = quote_etag(
+            f'recipe-{instance.id}-{int(updated * 1000000)}-{flags}'
+        )
+        last_modified = (
+            None if request.user.is_authenticated else int(updated)
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        ) or Response(self.get_serializer(instance, context=context).data)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
 
     def perform_create(self, serializer) -> None:
         """
         Specifies the behavior of the need to match author and request.user.
+        Reloads the recipe with its document for the response.
+        """
+        recipe = serializer.save(author=self.request.user)
+        serializer.instance = self.get_queryset().get(pk=recipe.pk)
+
+    @transaction.atomic
+    def perform_update(self, serializer) -> None:
         """
-        serializer.save(author=self.request.user)
+        Schedule the document of the updated recipe, as bulk ingredient
+        writes send no signals, together with the documents scheduled
+        by signals, so it is rebuilt once after the commit.
+        The response is serialized from the reloaded relations.
+        """
+        recipe = serializer.save()
+        schedule_recipe_documents([recipe.pk])
+        serializer.instance = Recipe.objects.with_relations().get(
+            pk=recipe.pk
+        )
+        serializer.context['recipe_documents'] = False
+
+    @transaction.atomic
+    def perform_destroy(self, instance: Recipe) -> None:
+        """
+        Delete recipe in one transaction, author recipes count
+        and buy lists of its cart rows are updated by signals.
+        """
+        instance.delete()
 
     @action(
         detail=True,
@@ -92,21 +233,80 @@ class RecipesViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        methods=['get'],
+        methods=['post', 'delete'],
+        url_path='favorite',
         permission_classes=[IsAuthenticated]
     )
-    def download_shopping_cart(self, request: Request) -> FileResponse:
+    def favorite_bulk(self, request: Request) -> Union[Response, None]:
         """
-        Download ingredients list from recipes
-        in cart at .pdf format.
+        Add or remove several recipes from favorite list
+        passed as 'recipes' list of ids.
         """
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__cart__user=request.user).values_list(
-            'ingredient__name', 'ingredient__measurement_unit',
-            'amount')
+        ids = request.data.get('recipes')
+        if request.method == 'POST':
+            return bulk_create_objs(Favorite, request.user, ids)
+        if request.method == 'DELETE':
+            return bulk_delete_objs(Favorite, request.user, ids)
+        return None
 
-        buy_list = create_buy_list(ingredients)
-        pdf_file = create_pdf_file(buy_list)
-        return FileResponse(
-            pdf_file, as_attachment=True, filename='buylist.pdf'
-        )
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_bulk(self, request: Request) -> Union[Response, None]:
+        """
+        Add or remove several recipes from shopping cart
+        passed as 'recipes' list of ids.
+        """
+        ids = request.data.get('recipes')
+        if request.method == 'POST':
+            return bulk_create_objs(Cart, request.user, ids)
+        if request.method == 'DELETE':
+            return bulk_delete_objs(Cart, request.user, ids)
+        return None
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            PDFRenderer, CSVRenderer, PlainTextRenderer, JSONRenderer
+        ],
+        content_negotiation_class=DownloadContentNegotiation
+    )
+    def download_shopping_cart(self, request: Request) -> HttpResponseBase:
+        """
+        Download ingredients list from recipes in cart
+        at .pdf (default), .csv, .txt or .json format,
+        chosen by 'format' param or Accept header naming one of them.
+        Returns 304 if the buy list was not changed since the last download.
+        """
+        file_format = request.accepted_renderer.format
+        version = get_buy_list_version(request.user.id)
+        etag = quote_etag(f'buylist-{version}-{file_format}')
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        elif file_format == PDFRenderer.format:
+            response = HttpResponse(
+                get_buy_list_pdf(request.user, version),
+                content_type=PDFRenderer.media_type
+            )
+        else:
+            response = StreamingHttpResponse(
+                BUY_LIST_STREAMS[file_format](
+                    get_buy_list(request.user).iterator()
+                ),
+                content_type=(
+                    f'{request.accepted_renderer.media_type}; charset=utf-8'
+                )
+            )
+        if response.status_code == status.HTTP_200_OK:
+            response['Content-Disposition'] = (
+                f'attachment; filename="buylist.{file_format}"'
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -29,3 +29,4 @@ MIN_ONE_TAG = 'Необходимо добавить хотя бы один те
 COOKING_TIME = 'Время приготовления не может быть меньше одной минуты.'
 INGREDIENT_AMOUNT = 'Количество ингредиентов не может быть меньше одного.'
 UNIQUE_INGREDIENTS = 'Ингредиенты не должны повторяться.'
+UNKNOWN_FIELDS = 'Неизвестные поля'
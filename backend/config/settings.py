@@ -15,6 +15,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -71,6 +72,39 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+BUY_LIST_CACHE_TIMEOUT = int(os.getenv('BUY_LIST_CACHE_TIMEOUT', default=60 * 60))
+
+VIEWER_STATE_CACHE_TIMEOUT = int(os.getenv('VIEWER_STATE_CACHE_TIMEOUT', default=60 * 60))
+
+TOKEN_AUTH_LOCAL_SIZE = int(os.getenv('TOKEN_AUTH_LOCAL_SIZE', default=1024))
+
+TOKEN_AUTH_LOCAL_TIMEOUT = int(os.getenv('TOKEN_AUTH_LOCAL_TIMEOUT', default=5))
+
+TOKEN_AUTH_SHARED_CACHE = bool(int(os.getenv('TOKEN_AUTH_SHARED_CACHE', default=1)))
+
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.getenv('TOKEN_AUTH_CACHE_TIMEOUT', default=60 * 5))
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=60 * 60))
+
+RESPONSE_CACHE_LOCK_TIMEOUT = int(os.getenv('RESPONSE_CACHE_LOCK_TIMEOUT', default=10))
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', default=30))
+
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', default=10000))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+
+INGREDIENT_SEARCH_IN_MEMORY = bool(int(os.getenv('INGREDIENT_SEARCH_IN_MEMORY', default=1)))
+
+INGREDIENT_FUZZY_MIN_LENGTH = int(os.getenv('INGREDIENT_FUZZY_MIN_LENGTH', default=3))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -89,7 +123,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.v1.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -1,66 +1,382 @@
-import io
-from typing import Any, Dict, List, Type, Union
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union
 
+from api.v1.fast_serializers import SHORT_RECIPE_FIELDS, get_short_recipes_data
 from api.v1.models import Cart, Favorite, Ingredient, IngredientRecipe, Recipe
 from config import config_messages as msg
-from django.db.models import QuerySet
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import (Count, F, IntegerField, OuterRef, QuerySet,
+                              Subquery, Window)
+from django.db.models.functions import Coalesce, Greatest, RowNumber
 from django.shortcuts import get_object_or_404
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
+from django.utils import timezone
 from rest_framework import serializers, status
 from rest_framework.response import Response
+from services.buy_list_services import (add_recipes_to_buy_list,
+                                        apply_recipe_amounts_change,
+                                        remove_recipes_from_buy_list)
+from services.response_cache_services import bump_catalog_version
+from services.viewer_services import invalidate_viewer_ids
+
+User = get_user_model()
 
 
 def create_ingredient_amount_relations(
         ingredients: List[Dict[str, str]], recipe: Recipe
 ) -> None:
     """Create relations between recipe and ingredientsamount models."""
-    for ingredient in ingredients:
-        IngredientRecipe.objects.create(
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(
             ingredient_id=ingredient['id'],
             amount=ingredient['amount'],
             recipe=recipe
         )
+        for ingredient in ingredients
+    )
+
+
+def update_ingredient_amount_relations(
+        ingredients: List[Dict[str, str]], recipe: Recipe
+) -> None:
+    """
+    Sync relations between recipe and ingredientsamount models,
+    touching only the rows whose amount was added, changed or removed.
+    Bulk writes send no signals, so the catalog is invalidated,
+    the recipe is marked updated and buy lists get the changed
+    and added amounts here. Removed rows are handled by signals.
+    """
+    amounts = {
+        int(ingredient['id']): int(ingredient['amount'])
+        for ingredient in ingredients
+    }
+    to_update, to_delete, delta = list(), list(), dict()
+    for relation in recipe.ingredientrecipe_set.all():
+        amount = amounts.pop(relation.ingredient_id, None)
+        if amount is None:
+            to_delete.append(relation.id)
+        elif amount != relation.amount:
+            delta[relation.ingredient_id] = amount - relation.amount
+            relation.amount = amount
+            to_update.append(relation)
+    delta.update(amounts)
+
+    if to_delete:
+        IngredientRecipe.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        IngredientRecipe.objects.bulk_update(to_update, ['amount'])
+    if amounts:
+        create_ingredient_amount_relations(
+            [{'id': pk, 'amount': amount} for pk, amount in amounts.items()],
+            recipe
+        )
+    if delta or to_delete:
+        bump_catalog_version()
+        touch_recipes([recipe.id])
+    apply_recipe_amounts_change(recipe, delta)
+
+
+def touch_recipes(recipe_ids: Iterable[int]) -> None:
+    """Set updated timestamp of the recipes whose relations changed."""
+    Recipe.objects.filter(id__in=list(recipe_ids)).update(
+        updated_at=timezone.now()
+    )
+
+
+def update_recipe_tags(tags: List[Any], recipe: Recipe) -> None:
+    """Add and remove only the recipe tags that were changed."""
+    current = {tag.id for tag in recipe.tags.all()}
+    submitted = {int(tag) for tag in tags}
+    if current - submitted:
+        recipe.tags.remove(*(current - submitted))
+    if submitted - current:
+        recipe.tags.add(*(submitted - current))
+
+
+def update_recipes_tags_mask(recipe_ids: Iterable[int]) -> None:
+    """Recompute tags mask of the recipes from their tags bits."""
+    masks = {pk: 0 for pk in recipe_ids}
+    if not masks:
+        return
+    for recipe_id, bit in Recipe.tags.through.objects.filter(
+            recipe_id__in=list(masks)
+    ).exclude(tag__bit=None).values_list('recipe_id', 'tag__bit'):
+        masks[recipe_id] |= 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(id=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ['tags_mask']
+    )
+
+
+def clear_tags_mask_bit(bit: Optional[int]) -> None:
+    """Remove tag bit from tags mask of all recipes."""
+    if bit is None:
+        return
+    Recipe.objects.filter(
+        tags_mask__gt=0
+    ).update(tags_mask=F('tags_mask').bitand(~(1 << bit)))
 
 
-def get_exists_models_relations(
-        user: Any, model: Type[Recipe], params: Dict[str, Any]
-) -> bool:
-    """Return boolean value of the filtered model."""
+def get_recipes_limit(value: Optional[str]) -> Optional[int]:
+    """Return recipes_limit query param as integer or None if invalid."""
+    if value is None or not str(value).isdecimal():
+        return None
+    return int(value)
+
+
+def get_authors_recipes(
+        author_ids: Iterable[int], limit: Optional[int] = None
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Return values() rows of the latest recipes of every author
+    in a single query.
+    If @param 'limit' is set, only the last N recipes per author are
+    selected using ROW_NUMBER() partitioned by author.
+    """
+    fields = ('author_id', *SHORT_RECIPE_FIELDS)
+    queryset = Recipe.objects.filter(
+        author_id__in=list(author_ids)
+    ).values(*fields)
+    if limit is None:
+        rows = list(queryset)
+    else:
+        ranked = queryset.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=F('id').desc()
+        ))
+        sql, params = ranked.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {", ".join(fields)} FROM ({sql}) ranked '
+                f'WHERE row_number <= %s ORDER BY id DESC',
+                (*params, limit)
+            )
+            rows = [dict(zip(fields, row)) for row in cursor.fetchall()]
+    recipes = defaultdict(list)
+    for row in rows:
+        recipes[row['author_id']].append(row)
+    return recipes
+
+
+VIEWER_STATE_KINDS = {Favorite: 'favorites', Cart: 'cart'}
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    Cart: 'in_carts_count',
+}
+
+
+def count_subquery(queryset: QuerySet, field: str) -> Coalesce:
+    """Return subquery counting queryset rows related to the outer row."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('id')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def change_recipe_counter(
+        model: Type[Union[Favorite, Cart]], recipe_ids: Iterable[int],
+        value: int
+) -> None:
+    """
+    Change favorites or carts counter of the recipes by value,
+    a drifted counter is never decreased below zero.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    field = RECIPE_COUNTERS[model]
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        **{field: Greatest(F(field) + value, 0)}
+    )
+
+
+def change_recipes_count(author_id: int, value: int) -> None:
+    """
+    Change recipes counter of the author by value,
+    a drifted counter is never decreased below zero.
+    """
+    User.objects.filter(id=author_id).update(
+        recipes_count=Greatest(F('recipes_count') + value, 0)
+    )
+
+
+def get_viewer_recipe_columns(
+        model: Type[Union[Favorite, Cart]]
+) -> Tuple[str, str, str]:
+    """Return quoted table, user and recipe columns of the model."""
+    meta = model._meta
+    quote = connection.ops.quote_name
     return (
-        False if user.is_anonymous
-        else model.objects.filter(**params).exists()
+        quote(meta.db_table),
+        quote(meta.get_field('user').column),
+        quote(meta.get_field('recipe').column),
     )
 
 
+def insert_viewer_recipes(
+        model: Type[Union[Favorite, Cart]], user_id: int,
+        recipe_ids: List[int]
+) -> List[int]:
+    """
+    Insert favorite or cart rows with a single statement skipping
+    existing ones and return recipe ids of the inserted rows.
+    The statement sends no signals.
+    """
+    if not recipe_ids:
+        return []
+    table, user_column, recipe_column = get_viewer_recipe_columns(model)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {recipe_column}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(recipe_ids))} '
+            f'ON CONFLICT DO NOTHING RETURNING {recipe_column}',
+            [value for pk in recipe_ids for value in (user_id, pk)]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_viewer_recipes(
+        model: Type[Union[Favorite, Cart]], user_id: int,
+        recipe_ids: List[int]
+) -> List[int]:
+    """
+    Delete favorite or cart rows with a single statement
+    and return recipe ids of the deleted rows.
+    The statement sends no signals.
+    """
+    if not recipe_ids:
+        return []
+    table, user_column, recipe_column = get_viewer_recipe_columns(model)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {recipe_column} IN ({", ".join(["%s"] * len(recipe_ids))}) '
+            f'RETURNING {recipe_column}',
+            [user_id, *recipe_ids]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def viewer_recipes_added(
+        model: Type[Union[Favorite, Cart]], user_id: int,
+        recipe_ids: List[int]
+) -> None:
+    """
+    Count recipes added to favorite list or cart by a statement
+    sending no signals, and put added cart recipes in the buy list.
+    """
+    if not recipe_ids:
+        return
+    change_recipe_counter(model, recipe_ids, 1)
+    invalidate_viewer_ids(VIEWER_STATE_KINDS[model], [user_id])
+    if model is Cart:
+        add_recipes_to_buy_list(user_id, recipe_ids)
+
+
+def viewer_recipes_removed(
+        model: Type[Union[Favorite, Cart]], user_id: int,
+        recipe_ids: List[int]
+) -> None:
+    """
+    Uncount recipes removed from favorite list or cart by a statement
+    sending no signals, and subtract removed cart recipes
+    from the buy list.
+    """
+    if not recipe_ids:
+        return
+    change_recipe_counter(model, recipe_ids, -1)
+    invalidate_viewer_ids(VIEWER_STATE_KINDS[model], [user_id])
+    if model is Cart:
+        remove_recipes_from_buy_list(user_id, recipe_ids)
+
+
+@transaction.atomic
 def create_obj(
         model: Type[Union[Favorite, Cart]], serializer, user: Any, pk: int
 ) -> Response:
-    """Adding recipe to favorite list or return error (400)."""
-    if model.objects.filter(user=user, recipe__id=pk).exists():
+    """
+    Adding recipe to favorite list or return error (400).
+    Duplicates are skipped by the unique constraint in the insert,
+    so concurrent requests can't add the recipe twice.
+    """
+    recipe = get_object_or_404(Recipe, id=pk)
+    added = insert_viewer_recipes(model, user.id, [recipe.id])
+    if not added:
         return Response(
             {'errors': msg.RECIPE_ALREADY_EXIST},
             status=status.HTTP_400_BAD_REQUEST
         )
-    recipe = get_object_or_404(Recipe, id=pk)
-    model.objects.create(user=user, recipe=recipe)
+    viewer_recipes_added(model, user.id, added)
     serializer = serializer(recipe)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@transaction.atomic
 def delete_obj(
         model: Type[Union[Favorite, Cart]], user: Any, pk: int
 ) -> Response:
-    """Remove recipe from favorite list or return error (400)."""
-    obj = model.objects.filter(user=user, recipe__id=pk)
-    if obj.exists():
-        obj.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    """
+    Remove recipe from favorite list or return error (400).
+    Only the request which deleted the row counts it as removed.
+    """
+    validate_value(pk)
+    removed = delete_viewer_recipes(model, user.id, [int(pk)])
+    if not removed:
+        return Response(
+            {'errors': f'{msg.CANT_FIND_RECIPE}: {pk}.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    viewer_recipes_removed(model, user.id, removed)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def validate_recipe_ids(ids: Any) -> List[int]:
+    """Validate list of recipe ids and return unique ids."""
+    if not isinstance(ids, list) or not ids:
+        raise serializers.ValidationError(
+            {'recipes': f'"{ids}" {msg.SHOULD_BE_LIST}.'}
+        )
+    validate_values(ids, Recipe, 'recipes')
+    return list(dict.fromkeys(int(pk) for pk in ids))
+
+
+@transaction.atomic
+def bulk_create_objs(
+        model: Type[Union[Favorite, Cart]], user: Any, ids: Any
+) -> Response:
+    """
+    Adding recipes to favorite list or cart in one request.
+    Recipes already in the list are skipped by the unique constraint
+    in the insert, so concurrent requests count every recipe once.
+    """
+    ids = validate_recipe_ids(ids)
+    viewer_recipes_added(
+        model, user.id, insert_viewer_recipes(model, user.id, ids)
+    )
     return Response(
-        {'errors': f'{msg.CANT_FIND_RECIPE}: {pk}.'},
-        status=status.HTTP_400_BAD_REQUEST
+        get_short_recipes_data(Recipe.objects.filter(
+            id__in=ids
+        ).values(*SHORT_RECIPE_FIELDS)),
+        status=status.HTTP_201_CREATED
+    )
+
+
+@transaction.atomic
+def bulk_delete_objs(
+        model: Type[Union[Favorite, Cart]], user: Any, ids: Any
+) -> Response:
+    """
+    Remove recipes from favorite list or cart in one request.
+    Only rows deleted by this request are counted as removed.
+    """
+    ids = validate_recipe_ids(ids)
+    viewer_recipes_removed(
+        model, user.id, delete_viewer_recipes(model, user.id, ids)
     )
+    return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 def validate_value(value, model=None, field_name=None) -> Type[
@@ -79,6 +395,23 @@ def validate_value(value, model=None, field_name=None) -> Type[
     return None
 
 
+def validate_values(values: List[Any], model, field_name: str) -> None:
+    """
+    Validate values are decimal and exist in model
+    using a single query for the whole list.
+    """
+    for value in values:
+        validate_value(value)
+    existing = set(model.objects.filter(
+        id__in=[int(value) for value in values]
+    ).values_list('id', flat=True))
+    for value in values:
+        if int(value) not in existing:
+            raise serializers.ValidationError(
+                {field_name: f'{value} {msg.NOT_EXIST}'}
+            )
+
+
 def check_data_to_list_isinstance(ingredients: list, tags: list) -> None:
     """Check data to type (list) and is not None."""
     for value in (ingredients, tags):
@@ -104,41 +437,3 @@ def check_ingredients_is_unique(ingredients):
     """Check ingredients and raise error if is not unique."""
     if len(ingredients) > len({x['id']: x for x in ingredients}.values()):
         raise serializers.ValidationError(msg.UNIQUE_INGREDIENTS)
-
-
-def create_buy_list(ingredients: QuerySet) -> Dict[str, dict]:
-    """Create buy list with unique ingredients for all recipes in cart."""
-    buy_list = dict()
-    for ingredient in ingredients:
-        if ingredient[0] not in buy_list:
-            buy_list[ingredient[0]] = {
-                'measurement_unit': ingredient[1],
-                'amount': ingredient[2]
-            }
-        else:
-            buy_list[ingredient[0]]['amount'] += ingredient[2]
-    return buy_list
-
-
-def create_pdf_file(data: Dict[str, dict]) -> io.BytesIO:
-    """Create pdf file with buy list."""
-    height = 770
-    width = 75
-    buffer = io.BytesIO()
-    pdfmetrics.registerFont(TTFont('DejaVuSerif', 'DejaVuSerif.ttf', 'UTF-8'))
-    p = canvas.Canvas(buffer)
-    p.setFont('DejaVuSerif', size=14)
-    p.drawString(75, 800, f'{msg.INGR_LIST}:')
-    p.setFont('DejaVuSerif', size=12)
-    for i, (name, data) in enumerate(data.items(), 1):
-        p.drawString(
-            x=width,
-            y=height,
-            text=f'{i}) {name} - {data["amount"]}, {data["measurement_unit"]}'
-        )
-        height -= 15
-    p.showPage()
-    p.save()
-    buffer.seek(0)
-
-    return buffer
@@ -0,0 +1,293 @@
+import io
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api.v1.models import BuyListItem, Cart, IngredientRecipe, Recipe
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet, Sum
+from services.cache_services import bump_version_counters, get_version_counter
+from services.pdf_services import render_buy_list
+from services.user_services import lock_users
+
+BUY_LIST_GENERATION_KEY = 'buy_list_generation'
+BUY_LIST_VERSION_KEY = 'buy_list_version:{}'
+BUY_LIST_PDF_KEY = 'buy_list_pdf:{}:{}'
+
+
+def get_recipe_amounts(recipe: Recipe) -> Dict[int, int]:
+    """Return {ingredient_id: amount} for the recipe."""
+    return get_recipes_amounts([recipe.id])
+
+
+def get_recipes_amounts(recipe_ids: Iterable[int]) -> Dict[int, int]:
+    """Return {ingredient_id: total amount} for the recipes."""
+    amounts = defaultdict(int)
+    for ingredient_id, amount in IngredientRecipe.objects.filter(
+            recipe_id__in=list(recipe_ids)
+    ).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def get_buy_list_version(user_id: int) -> str:
+    """Return version of the user buy list, changed on every update."""
+    return (
+        f'{get_version_counter(BUY_LIST_GENERATION_KEY)}-'
+        f'{get_version_counter(BUY_LIST_VERSION_KEY.format(user_id))}'
+    )
+
+
+@transaction.atomic(savepoint=False)
+def apply_buy_list_delta(
+        user_ids: Iterable[int], delta: Dict[int, int]
+) -> None:
+    """
+    Add {ingredient_id: amount} delta to the buy lists of the users.
+    Rows with non positive total amount are removed.
+    Should be called inside the transaction changing the source rows.
+    """
+    user_ids = list(user_ids)
+    delta = {pk: amount for pk, amount in delta.items() if amount}
+    if not user_ids or not delta:
+        return
+
+    lock_users(user_ids)
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in BuyListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=list(delta)
+        )
+    }
+    to_create, to_update, to_delete = list(), list(), list()
+    for user_id in user_ids:
+        for ingredient_id, amount in delta.items():
+            item = items.get((user_id, ingredient_id))
+            if item is None:
+                if amount > 0:
+                    to_create.append(BuyListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=amount
+                    ))
+                continue
+            item.total_amount += amount
+            if item.total_amount > 0:
+                to_update.append(item)
+            else:
+                to_delete.append(item.id)
+
+    if to_delete:
+        BuyListItem.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        BuyListItem.objects.bulk_update(to_update, ['total_amount'])
+    if to_create:
+        BuyListItem.objects.bulk_create(to_create)
+    bump_version_counters(
+        BUY_LIST_VERSION_KEY.format(user_id) for user_id in user_ids
+    )
+
+
+def add_recipe_to_buy_list(user_id: int, recipe: Recipe) -> None:
+    """Add recipe ingredients to the user buy list."""
+    apply_buy_list_delta([user_id], get_recipe_amounts(recipe))
+
+
+def remove_recipe_from_buy_list(user_id: int, recipe: Recipe) -> None:
+    """Subtract recipe ingredients from the user buy list."""
+    amounts = get_recipe_amounts(recipe)
+    apply_buy_list_delta(
+        [user_id], {pk: -amount for pk, amount in amounts.items()}
+    )
+
+
+def add_recipes_to_buy_list(user_id: int, recipe_ids: List[int]) -> None:
+    """Add ingredients of several recipes to the user buy list."""
+    if recipe_ids:
+        apply_buy_list_delta([user_id], get_recipes_amounts(recipe_ids))
+
+
+def lock_cart(cart: Cart) -> bool:
+    """
+    Lock the owner of the cart row being deleted and return True
+    if the row is still stored, so a row already deleted
+    by a concurrent transaction is not subtracted twice.
+    """
+    lock_users([cart.user_id])
+    return Cart.objects.filter(pk=cart.pk).exists()
+
+
+def remove_recipes_from_buy_list(
+        user_id: int, recipe_ids: List[int]
+) -> None:
+    """Subtract ingredients of several recipes from the user buy list."""
+    if recipe_ids:
+        amounts = get_recipes_amounts(recipe_ids)
+        apply_buy_list_delta(
+            [user_id], {pk: -amount for pk, amount in amounts.items()}
+        )
+
+
+def remove_cart_from_buy_list(cart: Cart) -> None:
+    """
+    Subtract ingredients of the deleted cart row recipe, which are
+    still stored, from the owner buy list. Ingredients deleted
+    with the recipe are subtracted by their own signals.
+    """
+    remove_recipe_from_buy_list(cart.user_id, Recipe(id=cart.recipe_id))
+
+
+def apply_recipe_amounts_change(
+        recipe: Recipe, delta: Dict[int, int]
+) -> None:
+    """Apply recipe ingredients change to the buy lists of its carts."""
+    delta = {pk: amount for pk, amount in delta.items() if amount}
+    if not delta:
+        return
+    apply_buy_list_delta(
+        Cart.objects.filter(recipe=recipe).values_list('user_id', flat=True),
+        delta
+    )
+
+
+def get_stored_recipe_ingredient(
+        relation: IngredientRecipe
+) -> Optional[Dict[str, Any]]:
+    """
+    Return stored recipe, ingredient and amount of the relation
+    being saved or None for a new one. Inside a transaction
+    the row is locked, so concurrent edits are applied one at a time.
+    """
+    if relation._state.adding:
+        return None
+    queryset = IngredientRecipe.objects.filter(pk=relation.pk)
+    if transaction.get_connection().in_atomic_block:
+        queryset = queryset.select_for_update()
+    return queryset.values('recipe_id', 'ingredient_id', 'amount').first()
+
+
+def apply_recipe_ingredient_change(
+        stored: Optional[Dict[str, Any]], relation: IngredientRecipe
+) -> None:
+    """Apply saved relation amount change to the buy lists."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    if stored is not None:
+        deltas[stored['recipe_id']][stored['ingredient_id']] -= (
+            stored['amount']
+        )
+    deltas[relation.recipe_id][relation.ingredient_id] += relation.amount
+    for recipe_id, delta in deltas.items():
+        apply_recipe_amounts_change(Recipe(id=recipe_id), delta)
+
+
+def lock_recipe_ingredient(relation: IngredientRecipe) -> bool:
+    """
+    Lock owners of the carts with the recipe of the relation being
+    deleted and return True if the relation is still stored
+    and counted in their buy lists.
+    """
+    user_ids = list(Cart.objects.filter(
+        recipe_id=relation.recipe_id
+    ).values_list('user_id', flat=True))
+    if not user_ids:
+        return False
+    lock_users(user_ids)
+    return IngredientRecipe.objects.filter(pk=relation.pk).exists()
+
+
+def remove_recipe_ingredient_from_buy_lists(
+        relation: IngredientRecipe
+) -> None:
+    """
+    Subtract the deleted relation from the buy lists of carts,
+    which are still stored, with its recipe.
+    """
+    apply_recipe_amounts_change(
+        Recipe(id=relation.recipe_id),
+        {relation.ingredient_id: -relation.amount}
+    )
+
+
+def get_buy_list(user) -> QuerySet:
+    """
+    Return (name, measurement_unit, amount) rows of unique ingredients
+    for all recipes in the user cart.
+    """
+    return BuyListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ).order_by('ingredient__name')
+
+
+def compute_buy_lists() -> Dict[Tuple[int, int], int]:
+    """Return {(user_id, ingredient_id): total_amount} from source rows."""
+    rows = IngredientRecipe.objects.filter(
+        recipe__cart__isnull=False
+    ).values_list(
+        'recipe__cart__user_id', 'ingredient_id'
+    ).annotate(total_amount=Sum('amount')).order_by()
+    return {
+        (user_id, ingredient_id): total_amount
+        for user_id, ingredient_id, total_amount in rows
+    }
+
+
+def get_buy_lists_diff() -> List[Tuple[int, int, int, int]]:
+    """
+    Return (user_id, ingredient_id, stored, expected) rows
+    for every buy list item out of sync with source rows.
+    """
+    expected = compute_buy_lists()
+    stored = {
+        (user_id, ingredient_id): total_amount
+        for user_id, ingredient_id, total_amount in
+        BuyListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'total_amount'
+        )
+    }
+    return [
+        (*key, stored.get(key, 0), expected.get(key, 0))
+        for key in sorted(expected.keys() | stored.keys())
+        if stored.get(key, 0) != expected.get(key, 0)
+    ]
+
+
+def rebuild_buy_lists() -> int:
+    """Recreate all buy list items from source rows."""
+    items = [
+        BuyListItem(
+            user_id=user_id,
+            ingredient_id=ingredient_id,
+            total_amount=total_amount
+        )
+        for (user_id, ingredient_id), total_amount in
+        compute_buy_lists().items()
+    ]
+    BuyListItem.objects.all().delete()
+    BuyListItem.objects.bulk_create(items, batch_size=1000)
+    invalidate_buy_lists()
+    return len(items)
+
+
+def invalidate_buy_lists() -> None:
+    """
+    Change versions of all buy lists, used when rows they are
+    rendered from change without touching buy list items.
+    """
+    bump_version_counters([BUY_LIST_GENERATION_KEY])
+
+
+def get_buy_list_pdf(user, version: str) -> bytes:
+    """
+    Return rendered pdf file with the user buy list.
+    Rendered file is cached under the buy list version,
+    so it is rendered again only when the buy list changes.
+    """
+    key = BUY_LIST_PDF_KEY.format(user.id, version)
+    pdf_file = cache.get(key)
+    if pdf_file is None:
+        buffer = io.BytesIO()
+        render_buy_list(get_buy_list(user), buffer)
+        pdf_file = buffer.getvalue()
+        cache.set(key, pdf_file, timeout=settings.BUY_LIST_CACHE_TIMEOUT)
+    return pdf_file
@@ -0,0 +1,41 @@
+import time
+from typing import Iterable
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+LOCAL_CACHE_BACKENDS = (DummyCache, LocMemCache)
+
+
+def is_cache_shared() -> bool:
+    """Return True if the default cache is shared by processes."""
+    return not isinstance(caches['default'], LOCAL_CACHE_BACKENDS)
+
+
+def get_version_counter(key: str) -> int:
+    """
+    Return version counter stored in cache.
+    Missing counter starts from the current time, so a counter evicted
+    from cache never repeats versions of already cached documents.
+    """
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.get(key)
+    return value
+
+
+def bump_version_counters(keys: Iterable[str]) -> None:
+    """Increment version counters once the transaction is committed."""
+    keys = list(keys)
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass
+
+    transaction.on_commit(bump)
@@ -0,0 +1,51 @@
+import csv
+import json
+from typing import Iterable, Iterator, Tuple
+
+from config import config_messages as msg
+
+
+class EchoBuffer:
+    """File-like object returning written value instead of storing it."""
+
+    @staticmethod
+    def write(value: str) -> str:
+        return value
+
+
+def stream_csv(rows: Iterable[Tuple[str, str, int]]) -> Iterator[str]:
+    """Yield buy list as csv lines."""
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_text(rows: Iterable[Tuple[str, str, int]]) -> Iterator[str]:
+    """Yield buy list as plain text lines."""
+    yield f'{msg.INGR_LIST}:\n'
+    for i, (name, measurement_unit, amount) in enumerate(rows, 1):
+        yield f'{i}) {name} - {amount}, {measurement_unit}\n'
+
+
+def stream_json(rows: Iterable[Tuple[str, str, int]]) -> Iterator[str]:
+    """Yield buy list as json array of objects."""
+    yield '['
+    for i, (name, measurement_unit, amount) in enumerate(rows):
+        item = json.dumps(
+            {
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount
+            },
+            ensure_ascii=False
+        )
+        yield f',{item}' if i else item
+    yield ']'
+
+
+BUY_LIST_STREAMS = {
+    'csv': stream_csv,
+    'txt': stream_text,
+    'json': stream_json,
+}
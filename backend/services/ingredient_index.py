@@ -0,0 +1,89 @@
+import threading
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+from api.v1.models import Ingredient
+from django.db.models import Count, Max
+from services.cache_services import (bump_version_counters,
+                                     get_version_counter, is_cache_shared)
+
+INGREDIENT_INDEX_VERSION_KEY = 'ingredient_index_version'
+
+
+def normalize(value: str) -> str:
+    """Return case-folded key used for prefix comparison."""
+    return value.casefold()
+
+
+class IngredientIndex:
+    """
+    Sorted array of ingredient names for prefix lookups.
+    Keys are case-folded names, rows are (id, name, measurement_unit)
+    tuples stored in the same order.
+    """
+
+    def __init__(self, rows: List[Tuple[int, str, str]]):
+        rows = sorted(rows, key=lambda row: (normalize(row[1]), row[0]))
+        self.keys = tuple(normalize(row[1]) for row in rows)
+        self.rows = tuple(rows)
+
+    def search(
+            self, prefix: str = '', limit: Optional[int] = None
+    ) -> Tuple[Tuple[int, str, str], ...]:
+        """Return rows whose name starts with prefix, ordered by name."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return self.rows[:limit]
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\U0010ffff', lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.rows[start:end]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_ingredient_index_version() -> Tuple[Optional[int], ...]:
+    """
+    Return version of ingredients the index is built from.
+    Counter bumped in other processes, e.g. by upload_ingredients,
+    is not seen when the cache is local to the process,
+    so the count and the last id of ingredients are compared too.
+    """
+    version = get_version_counter(INGREDIENT_INDEX_VERSION_KEY)
+    if is_cache_shared():
+        return (version,)
+    stats = Ingredient.objects.aggregate(count=Count('id'), last=Max('id'))
+    return version, stats['count'], stats['last']
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """
+    Return process-wide ingredient index.
+    Index is built on first use and rebuilt after ingredients change.
+    """
+    version = get_ingredient_index_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                build_ingredient_index(version)
+    return _index
+
+
+def build_ingredient_index(version: Tuple[Optional[int], ...]) -> None:
+    """Build process-wide ingredient index for the given version."""
+    global _index, _index_version
+    _index = IngredientIndex(list(
+        Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ).order_by()
+    ))
+    _index_version = version
+
+
+def invalidate_ingredient_index() -> None:
+    """Mark ingredient index as stale in every process."""
+    bump_version_counters([INGREDIENT_INDEX_VERSION_KEY])
@@ -0,0 +1,77 @@
+from typing import List, Tuple
+
+from api.v1.models import Ingredient
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.functions import Lower
+from services.ingredient_index import get_ingredient_index
+
+Row = Tuple[int, str, str]
+
+
+def prefix_queryset(term: str) -> QuerySet:
+    """
+    Return ingredients whose name starts with term, ordered by name,
+    served by lower(name) text_pattern_ops index on PostgreSQL.
+    """
+    return Ingredient.objects.annotate(
+        lower_name=Lower('name')
+    ).filter(
+        lower_name__startswith=term.lower()
+    ).order_by('lower_name', 'id').values_list(
+        'id', 'name', 'measurement_unit'
+    )
+
+
+def prefix_matches(term: str, limit: int = None) -> List[Row]:
+    """
+    Return ingredients whose name starts with term, ordered by name.
+    Uses in-memory index or prefix queryset
+    if INGREDIENT_SEARCH_IN_MEMORY is disabled.
+    """
+    if settings.INGREDIENT_SEARCH_IN_MEMORY:
+        return list(get_ingredient_index().search(term, limit))
+    queryset = prefix_queryset(term)
+    return list(queryset[:limit] if limit is not None else queryset)
+
+
+def fuzzy_queryset(term: str, exclude: List[int]) -> QuerySet:
+    """
+    Return ingredients similar to term ranked by trigram similarity,
+    served by lower(name) gin_trgm_ops index on PostgreSQL.
+    """
+    return Ingredient.objects.annotate(
+        lower_name=Lower('name'),
+        similarity=TrigramSimilarity(Lower('name'), term.lower())
+    ).filter(
+        lower_name__trigram_similar=term.lower()
+    ).exclude(
+        id__in=exclude
+    ).order_by('-similarity', 'lower_name').values_list(
+        'id', 'name', 'measurement_unit'
+    )
+
+
+def fuzzy_matches(term: str, limit: int, exclude: List[int]) -> List[Row]:
+    """
+    Return ingredients similar to term ranked by trigram similarity.
+    Works on PostgreSQL only, on other databases returns empty list.
+    """
+    if connection.vendor != 'postgresql' or limit <= 0:
+        return []
+    return list(fuzzy_queryset(term, exclude)[:limit])
+
+
+def search_ingredients(term: str, limit: int) -> List[Row]:
+    """
+    Return prefix matches first, the rest is filled
+    with similarity-ranked fuzzy matches.
+    """
+    rows = prefix_matches(term, limit)
+    if len(term) >= settings.INGREDIENT_FUZZY_MIN_LENGTH:
+        rows += fuzzy_matches(
+            term, limit - len(rows), [row[0] for row in rows]
+        )
+    return rows
@@ -0,0 +1,16 @@
+class CounterFieldsMixin:
+    """
+    Keeps fields maintained by F() and bulk updates out of full saves
+    of existing rows, so a stale instance never overwrites them.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not args and not self._state.adding
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,52 @@
+from functools import lru_cache
+from typing import IO, Iterable, Tuple
+
+from config import config_messages as msg
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+FONT_NAME = 'DejaVuSerif'
+FONT_FILE = 'DejaVuSerif.ttf'
+TITLE_FONT_SIZE = 14
+LINE_FONT_SIZE = 12
+LEFT_MARGIN = 75
+TITLE_TOP = 800
+FIRST_LINE_TOP = 770
+BOTTOM_MARGIN = 50
+LINE_HEIGHT = 15
+
+
+@lru_cache(maxsize=None)
+def register_font() -> str:
+    """Register the font once per process and return its name."""
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_FILE, 'UTF-8'))
+    return FONT_NAME
+
+
+def render_buy_list(
+        data: Iterable[Tuple[str, str, int]], stream: IO[bytes]
+) -> None:
+    """
+    Write pdf file with buy list into the stream,
+    starting a new page when the current one is full.
+    """
+    font = register_font()
+    p = canvas.Canvas(stream)
+    p.setFont(font, size=TITLE_FONT_SIZE)
+    p.drawString(LEFT_MARGIN, TITLE_TOP, f'{msg.INGR_LIST}:')
+    p.setFont(font, size=LINE_FONT_SIZE)
+    height = FIRST_LINE_TOP
+    for i, (name, measurement_unit, amount) in enumerate(data, 1):
+        if height < BOTTOM_MARGIN:
+            p.showPage()
+            p.setFont(font, size=LINE_FONT_SIZE)
+            height = TITLE_TOP
+        p.drawString(
+            x=LEFT_MARGIN,
+            y=height,
+            text=f'{i}) {name} - {amount}, {measurement_unit}'
+        )
+        height -= LINE_HEIGHT
+    p.showPage()
+    p.save()
@@ -0,0 +1,82 @@
+import json
+from typing import Iterable, List, Set, Tuple
+
+from api.v1.models import Recipe, RecipeDocument
+from api.v1.serializers import RecipeSerializer
+from django.db import transaction
+
+RECIPE_DOCUMENTS_BATCH_SIZE = 500
+
+
+def build_recipe_document(recipe: Recipe) -> str:
+    """
+    Return recipe representation serialized without request,
+    so viewer dependent flags are False and image url is relative.
+    """
+    return json.dumps(RecipeSerializer(recipe).data, ensure_ascii=False)
+
+
+def rebuild_recipe_documents(recipe_ids: Iterable[int]) -> int:
+    """
+    Rebuild documents of the recipes in batches.
+    Recipe rows are locked, so concurrent rebuilds of one recipe
+    are applied in order.
+    """
+    ids = sorted(set(recipe_ids))
+    count = 0
+    for start in range(0, len(ids), RECIPE_DOCUMENTS_BATCH_SIZE):
+        batch = ids[start:start + RECIPE_DOCUMENTS_BATCH_SIZE]
+        with transaction.atomic():
+            documents = [
+                RecipeDocument(
+                    recipe=recipe, data=build_recipe_document(recipe)
+                )
+                for recipe in Recipe.objects.select_for_update(
+                    of=('self',)
+                ).with_relations().filter(id__in=batch)
+            ]
+            RecipeDocument.objects.filter(recipe__in=[
+                document.recipe_id for document in documents
+            ]).delete()
+            RecipeDocument.objects.bulk_create(documents)
+        count += len(documents)
+    return count
+
+
+class RecipeDocumentsRebuild:
+    """On commit callback rebuilding documents of the collected recipes."""
+
+    def __init__(self, recipe_ids: Set[int]):
+        self.recipe_ids = recipe_ids
+
+    def __call__(self):
+        rebuild_recipe_documents(self.recipe_ids)
+
+
+def schedule_recipe_documents(recipe_ids: Iterable[int]) -> None:
+    """
+    Rebuild documents of the recipes after the commit.
+    Ids are added to the rebuild already waiting for the commit
+    of the transaction, so each document is rebuilt once.
+    Rolled back transaction drops the rebuild with its ids.
+    """
+    ids = set(recipe_ids)
+    if not ids:
+        return
+    for callback in transaction.get_connection().run_on_commit:
+        if isinstance(callback[1], RecipeDocumentsRebuild):
+            callback[1].recipe_ids |= ids
+            return
+    transaction.on_commit(RecipeDocumentsRebuild(ids))
+
+
+def get_recipe_documents_diff() -> List[Tuple[int, str]]:
+    """Return (recipe_id, state) of missing and outdated documents."""
+    diff = list()
+    queryset = Recipe.objects.with_relations().with_documents().order_by('id')
+    for recipe in queryset.iterator(chunk_size=RECIPE_DOCUMENTS_BATCH_SIZE):
+        if not hasattr(recipe, 'document'):
+            diff.append((recipe.id, 'missing'))
+        elif recipe.document.data != build_recipe_document(recipe):
+            diff.append((recipe.id, 'outdated'))
+    return diff
@@ -0,0 +1,62 @@
+import hashlib
+import time
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from services.cache_services import bump_version_counters, get_version_counter
+
+CATALOG_VERSION_KEY = 'catalog_version'
+RESPONSE_CACHE_KEY = 'response:{}:{}'
+RESPONSE_LOCK_KEY = 'response_lock:{}:{}'
+RESPONSE_WAIT_INTERVAL = 0.05
+
+
+def bump_catalog_version() -> None:
+    """Outdate cached catalog responses after the commit."""
+    bump_version_counters([CATALOG_VERSION_KEY])
+
+
+def get_params_digest(params: Iterable[Tuple[str, str]]) -> str:
+    """Return digest of query params regardless of their order."""
+    return hashlib.md5(str(sorted(params)).encode()).hexdigest()
+
+
+def get_cached_response(
+        prefix: str, params: Iterable[Tuple[str, str]],
+        build: Callable[[], Any]
+) -> Dict[str, Any]:
+    """
+    Return {'etag', 'modified', 'data'} entry of the catalog response.
+    Only one worker rebuilds a missing or outdated entry,
+    others serve the outdated entry or wait for the new one.
+    """
+    digest = get_params_digest(params)
+    key = RESPONSE_CACHE_KEY.format(prefix, digest)
+    version = get_version_counter(CATALOG_VERSION_KEY)
+    entry = cache.get(key)
+    if entry is not None and entry['version'] == version:
+        return entry
+
+    lock_key = RESPONSE_LOCK_KEY.format(prefix, digest)
+    timeout = settings.RESPONSE_CACHE_LOCK_TIMEOUT
+    if not cache.add(lock_key, version, timeout):
+        if entry is not None:
+            return entry
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(RESPONSE_WAIT_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+    try:
+        entry = {
+            'version': version,
+            'etag': f'{prefix}-{version}-{digest}',
+            'modified': int(time.time()),
+            'data': build(),
+        }
+        cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return entry
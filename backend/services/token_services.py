@@ -0,0 +1,152 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.authtoken.models import Token
+from services.cache_services import is_cache_shared
+
+User = get_user_model()
+
+TOKEN_CACHE_KEY = 'auth_token:{}'
+TOKEN_USER_FIELDS = frozenset((
+    'id', 'email', 'username', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser'
+))
+
+
+class TokenLRU:
+    """
+    Bounded in-process map of token key to Token with the user loaded.
+    Entries expire after the timeout, the least recently used entry
+    is dropped when the map is full.
+    """
+
+    def __init__(self, size: int, timeout: float):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Token]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            token, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return token
+
+    def set(self, key: str, token: Token) -> None:
+        if self.size <= 0 or self.timeout <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (token, time.monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+local_tokens = TokenLRU(
+    settings.TOKEN_AUTH_LOCAL_SIZE, settings.TOKEN_AUTH_LOCAL_TIMEOUT
+)
+
+
+def get_token_cache_key(key: str) -> str:
+    """Return shared cache key, raw tokens are never used as cache keys."""
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def use_shared_cache() -> bool:
+    """
+    Return True if resolved tokens are kept in the shared cache.
+    A process-local cache would keep revoked tokens of other processes
+    for TOKEN_AUTH_CACHE_TIMEOUT, so only the in-process map is used.
+    """
+    return settings.TOKEN_AUTH_SHARED_CACHE and is_cache_shared()
+
+
+def dump_token(token: Token) -> Dict[str, Any]:
+    """
+    Return token with the user fields authentication relies on,
+    the password hash and other user fields are never cached.
+    """
+    return {
+        'key': token.key,
+        'created': token.created,
+        'user': {
+            field: getattr(token.user, field) for field in TOKEN_USER_FIELDS
+        },
+    }
+
+
+def load_token(data: Dict[str, Any]) -> Token:
+    """
+    Return token with the user built from the cached fields,
+    other user fields are deferred and loaded on access.
+    """
+    fields = [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname in data['user']
+    ]
+    user = User.from_db(
+        DEFAULT_DB_ALIAS, fields, [data['user'][field] for field in fields]
+    )
+    return Token(key=data['key'], created=data['created'], user=user)
+
+
+def get_cached_token(key: str) -> Optional[Token]:
+    """Return cached token from the process or the shared cache."""
+    token = local_tokens.get(key)
+    if token is None and use_shared_cache():
+        data = cache.get(get_token_cache_key(key))
+        if data is not None:
+            token = load_token(data)
+            local_tokens.set(key, token)
+    return token
+
+
+def cache_token(token: Token) -> None:
+    """Remember resolved token with its user."""
+    local_tokens.set(token.key, token)
+    if use_shared_cache():
+        cache.set(
+            get_token_cache_key(token.key), dump_token(token),
+            settings.TOKEN_AUTH_CACHE_TIMEOUT
+        )
+
+
+def invalidate_tokens(keys: Iterable[str]) -> None:
+    """
+    Forget tokens now and once more after the commit,
+    so a token read by a concurrent request is not left behind.
+    """
+    keys = list(keys)
+
+    def forget():
+        for key in keys:
+            local_tokens.delete(key)
+        if use_shared_cache():
+            cache.delete_many([get_token_cache_key(key) for key in keys])
+
+    forget()
+    transaction.on_commit(forget)
+
+
+def invalidate_user_tokens(user_id: int) -> None:
+    """Forget tokens of the changed user."""
+    invalidate_tokens(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
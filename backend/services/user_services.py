@@ -1,6 +1,22 @@
+from typing import Iterable
+
 from config import config_messages as msg
+from django.contrib.auth import get_user_model
 from users.models import Follow
 
+User = get_user_model()
+
+
+def lock_users(user_ids: Iterable[int]) -> None:
+    """
+    Lock rows of the users until the end of the transaction,
+    so changes of their favorites, carts and buy lists,
+    including inserts of new rows, are applied one at a time.
+    """
+    list(User.objects.select_for_update().filter(
+        id__in=list(user_ids)
+    ).order_by('id').values_list('id', flat=True))
+
 
 class UserServices:
     validate_status = dict()
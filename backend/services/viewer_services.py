@@ -0,0 +1,56 @@
+from typing import Any, Dict, FrozenSet, Iterable
+
+from api.v1.models import Cart, Favorite
+from django.conf import settings
+from django.core.cache import cache
+from services.cache_services import bump_version_counters, get_version_counter
+from users.models import Follow
+
+VIEWER_STATE_KEY = 'viewer_state:{}:{}:{}'
+VIEWER_STATE_VERSION_KEY = 'viewer_state_version:{}:{}'
+VIEWER_STATE_SOURCES = {
+    'favorites': (Favorite, 'recipe_id'),
+    'cart': (Cart, 'recipe_id'),
+    'follows': (Follow, 'author_id'),
+}
+
+
+def get_viewer_ids(user: Any, kind: str) -> FrozenSet[int]:
+    """
+    Return ids of favorite recipes, recipes in cart or followed authors.
+    Set is cached per user and loaded in one query on a miss.
+    """
+    if user is None or user.is_anonymous:
+        return frozenset()
+    version = get_version_counter(
+        VIEWER_STATE_VERSION_KEY.format(kind, user.id)
+    )
+    key = VIEWER_STATE_KEY.format(kind, user.id, version)
+    ids = cache.get(key)
+    if ids is None:
+        model, field = VIEWER_STATE_SOURCES[kind]
+        ids = frozenset(
+            model.objects.filter(user_id=user.id).values_list(field, flat=True)
+        )
+        cache.set(key, ids, settings.VIEWER_STATE_CACHE_TIMEOUT)
+    return ids
+
+
+def get_context_viewer_ids(context: Dict[str, Any], kind: str
+                           ) -> FrozenSet[int]:
+    """Return viewer ids memoized in serializer context for the request."""
+    state = context.setdefault('viewer_state', {})
+    if kind not in state:
+        request = context.get('request')
+        state[kind] = get_viewer_ids(getattr(request, 'user', None), kind)
+    return state[kind]
+
+
+def invalidate_viewer_ids(kind: str, user_ids: Iterable[int]) -> None:
+    """
+    Switch users to a new version of the set after the commit,
+    so a set loaded concurrently with the write is never read again.
+    """
+    bump_version_counters(
+        VIEWER_STATE_VERSION_KEY.format(kind, pk) for pk in set(user_ids)
+    )
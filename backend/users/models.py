@@ -2,6 +2,7 @@ from config import config_messages as msg
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager,
                                         PermissionsMixin)
 from django.db import models
+from services.model_services import CounterFieldsMixin
 
 
 class CustomUserManager(BaseUserManager):
@@ -35,7 +36,7 @@ class CustomUserManager(BaseUserManager):
         )
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(CounterFieldsMixin, AbstractBaseUser, PermissionsMixin):
     """
     Stores a single custom user entry.
     Required fields:
@@ -73,10 +74,15 @@ class User(AbstractBaseUser, PermissionsMixin):
         default=False,
         help_text=msg.IS_STAFF
     )
-    is_subscribed = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Recipes count'
+    )
 
     objects = CustomUserManager()
+    counter_fields = ('recipes_count',)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
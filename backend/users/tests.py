@@ -0,0 +1,70 @@
+from api.tests import QueryCountTestCase, create_recipes, create_user
+
+from .models import Follow
+
+
+class SubscriptionsQueriesTest(QueryCountTestCase):
+    """Subscriptions are loaded with the same queries for any page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        for number in range(8):
+            author = create_user(f'author-{number}')
+            create_recipes(author, 4)
+            Follow.objects.create(user=cls.viewer, author=author)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.viewer)
+
+    def test_queries_do_not_depend_on_authors_count(self):
+        for limit in (2, 8):
+            response = self.get_with_queries(
+                f'/api/users/subscriptions/?limit={limit}', 4
+            )
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipes_limit_keeps_queries(self):
+        for recipes_limit in (1, 3):
+            response = self.get_with_queries(
+                '/api/users/subscriptions/?limit=8'
+                f'&recipes_limit={recipes_limit}', 4
+            )
+            for follow in response.data['results']:
+                self.assertEqual(len(follow['recipes']), recipes_limit)
+                self.assertEqual(follow['recipes_count'], 4)
+
+
+class UsersQueriesTest(QueryCountTestCase):
+    """User endpoints resolve is_subscribed with a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        cls.authors = [create_user(f'author-{number}') for number in range(8)]
+        for author in cls.authors[::2]:
+            Follow.objects.create(user=cls.viewer, author=author)
+
+    def test_anonymous_list(self):
+        for limit in (2, 9):
+            response = self.get_with_queries(f'/api/users/?limit={limit}', 2)
+            self.assertEqual(len(response.data['results']), limit)
+            self.assertFalse(any(
+                user['is_subscribed'] for user in response.data['results']
+            ))
+
+    def test_authenticated_list(self):
+        self.client.force_authenticate(self.viewer)
+        for limit in (2, 9):
+            response = self.get_with_queries(f'/api/users/?limit={limit}', 3)
+            self.assertEqual(len(response.data['results']), limit)
+        followed = {author.id for author in self.authors[::2]}
+        for user in response.data['results']:
+            self.assertEqual(user['is_subscribed'], user['id'] in followed)
+
+    def test_me(self):
+        self.client.force_authenticate(self.viewer)
+        response = self.get_with_queries('/api/users/me/', 1)
+        self.assertEqual(response.data['id'], self.viewer.id)
+        self.assertFalse(response.data['is_subscribed'])
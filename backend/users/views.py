@@ -11,6 +11,7 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
+from services.api_services import get_authors_recipes, get_recipes_limit
 from services.user_services import UserServices
 
 from .models import Follow
@@ -68,12 +69,20 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request: Request) -> Response:
+        """
+        Return followed authors with the latest recipes,
+        loaded for the whole page at once.
+        """
         user = request.user
-        queryset = Follow.objects.filter(user=user)
+        queryset = Follow.objects.filter(user=user).select_related('author')
         paginate = self.paginate_queryset(queryset)
+        authors_recipes = get_authors_recipes(
+            (follow.author_id for follow in paginate),
+            get_recipes_limit(request.GET.get('recipes_limit'))
+        )
         serializer = FollowSerializer(
             paginate,
             many=True,
-            context={'request': request}
+            context={'request': request, 'authors_recipes': authors_recipes}
         )
         return self.get_paginated_response(serializer.data)